@@ -0,0 +1,80 @@
+"""API benchmarks: list, summary and conditional request latency through the Flask test client.
+
+Run through run.py, which sets PYTHONPATH to services/api and disables the
+Redis response cache so every request reaches Postgres.
+"""
+import argparse
+import logging
+import uuid
+from sqlalchemy import text
+from app import create_app, db
+from common import emit, latency, timed
+
+REPEAT = 50
+
+
+def seed(rows):
+    """Insert ``rows`` checked certificates in one statement and return their URL prefix."""
+    prefix = f'https://api-bench-{uuid.uuid4().hex[:8]}-'
+    db.session.execute(text(
+        "INSERT INTO certificates (url, issuer, subject, status, valid_from, valid_until, last_checked, "
+        "error_count, next_check_at, created_at, updated_at) "
+        "SELECT :prefix || n || '.invalid', 'CN=Issuer ' || (n % 20), 'CN=host ' || n, "
+        "CASE WHEN n % 50 = 0 THEN 'error' ELSE 'valid' END, now() - interval '30 days', "
+        "now() + (n % 400) * interval '1 day', now(), 0, now() + interval '1 day', now(), now() "
+        "FROM generate_series(1, :rows) AS n"
+    ), {'prefix': prefix, 'rows': rows})
+    db.session.commit()
+    return prefix
+
+
+def walk(client, limit):
+    """Fetch every page of the list and return the number of pages."""
+    pages = 0
+    cursor = None
+    while True:
+        response = client.get('/certificates', query_string={'limit': limit, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200, response.data
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return pages
+
+
+def bench_api(rows):
+    app = create_app()
+    client = app.test_client()
+    results = []
+    with app.app_context():
+        prefix = seed(rows)
+        try:
+            results.append(latency('api.list_page', timed(
+                lambda: client.get('/certificates', query_string={'limit': 100}), REPEAT), rows=rows))
+            results.append(latency('api.list_filtered', timed(
+                lambda: client.get('/certificates', query_string={'limit': 100, 'expiring_within': 30,
+                                                                  'status': 'valid'}), REPEAT), rows=rows))
+            results.append(latency('api.list_walk', timed(lambda: walk(client, 1000), 3), rows=rows))
+            results.append(latency('api.summary', timed(lambda: client.get('/certificates/summary'), REPEAT),
+                                   rows=rows))
+
+            etag = client.get('/certificates', query_string={'limit': 100}).headers.get('ETag')
+            if etag:
+                results.append(latency('api.list_not_modified', timed(
+                    lambda: client.get('/certificates', query_string={'limit': 100},
+                                       headers={'If-None-Match': etag}), REPEAT), rows=rows))
+        finally:
+            db.session.execute(text("DELETE FROM certificates WHERE url LIKE :prefix || '%'"), {'prefix': prefix})
+            db.session.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000, help='certificates seeded for the list benchmarks')
+    args = parser.parse_args()
+    logging.getLogger('app').setLevel(logging.WARNING)
+    emit(bench_api(args.rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Worker benchmarks: probe throughput, sweep wall time and CSV import rate.
+
+Run through run.py, which starts the TLS farm and sets PYTHONPATH to
+services/worker along with the environment the benchmarks rely on.
+"""
+import argparse
+import asyncio
+import io
+import logging
+import time
+import uuid
+from collections import Counter
+from sqlalchemy import delete, insert
+from app.importer import insert_urls, run_import
+from app.models import Certificate, ImportJob
+from app.probe import probe_all, probe_many, probe_result
+from app.summary import rebuild_summary
+from app.database import get_engine
+from app.tasks import check_certificates, get_certificate_info, SWEEP_CHUNK_SIZE
+from common import emit, latency, load_farm, throughput, timed
+
+# Endpoints probed one by one through get_certificate_info
+SEQUENTIAL_SAMPLE = 50
+
+
+def bench_probe(endpoints):
+    targets = [(endpoint['url'], endpoint['url']) for endpoint in endpoints]
+
+    started = time.perf_counter()
+    results = probe_all(targets)
+    cold = throughput('probe.cold', len(targets), time.perf_counter() - started,
+                      outcomes=dict(Counter(probe_result(info) for info in results.values())))
+
+    # Every endpoint again, now skipping the parse of unchanged certificates
+    fingerprints = {key: info.get('fingerprint') for key, info in results.items() if info['status'] == 'valid'}
+
+    async def collect():
+        return {key: info async for key, info in probe_many(targets, fingerprints=fingerprints)}
+
+    started = time.perf_counter()
+    results = asyncio.run(collect())
+    unchanged = throughput('probe.unchanged', len(targets), time.perf_counter() - started,
+                           outcomes=dict(Counter(probe_result(info) for info in results.values())))
+
+    valid = [endpoint['url'] for endpoint in endpoints if endpoint['kind'] == 'valid'][:SEQUENTIAL_SAMPLE]
+    urls = iter(valid)
+    sequential = latency('probe.get_certificate_info', timed(lambda: get_certificate_info(next(urls)), len(valid)))
+    return [cold, unchanged, sequential]
+
+
+def bench_sweep(endpoints):
+    """Check every farm endpoint through the check_certificates task body, as one worker process would."""
+    with get_engine().begin() as conn:
+        cert_ids = insert_urls(conn, [endpoint['url'] for endpoint in endpoints])
+    chunks = [cert_ids[start:start + SWEEP_CHUNK_SIZE] for start in range(0, len(cert_ids), SWEEP_CHUNK_SIZE)]
+    results = []
+    try:
+        # The first pass parses and stores every certificate, the second finds them unchanged
+        for name in ('sweep.first', 'sweep.unchanged'):
+            started = time.perf_counter()
+            for chunk in chunks:
+                check_certificates(chunk)
+            results.append(throughput(name, len(cert_ids), time.perf_counter() - started, chunks=len(chunks)))
+    finally:
+        with get_engine().begin() as conn:
+            conn.execute(delete(Certificate.__table__).where(Certificate.id.in_(cert_ids)))
+            rebuild_summary(conn)
+    return results
+
+
+def bench_import(sizes):
+    results = []
+    for size in sizes:
+        job_id = str(uuid.uuid4())
+        prefix = f'https://bench-{job_id[:8]}-'
+        csv = 'url\n' + ''.join(f'{prefix}{row}.invalid\n' for row in range(size))
+        with get_engine().begin() as conn:
+            conn.execute(insert(ImportJob.__table__).values(id=job_id, filename='benchmark.csv', status='queued'))
+        try:
+            started = time.perf_counter()
+            counts = run_import(get_engine(), job_id, io.BufferedReader(io.BytesIO(csv.encode('utf-8'))),
+                                publish=lambda ids: None)
+            results.append(throughput(f'import.{size}', counts['rows_added'], time.perf_counter() - started))
+        finally:
+            with get_engine().begin() as conn:
+                conn.execute(delete(Certificate.__table__).where(Certificate.url.like(f'{prefix}%')))
+                conn.execute(delete(ImportJob.__table__).where(ImportJob.id == job_id))
+    with get_engine().begin() as conn:
+        rebuild_summary(conn)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=['probe', 'sweep', 'import'])
+    parser.add_argument('--farm', required=True, help='endpoints file written by run.py')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='CSV rows per import benchmark')
+    args = parser.parse_args()
+
+    # Broken farm endpoints are expected, their errors would drown the output
+    logging.getLogger('app').setLevel(logging.CRITICAL)
+    endpoints = load_farm(args.farm)
+    if args.benchmark == 'probe':
+        emit(bench_probe(endpoints))
+    elif args.benchmark == 'sweep':
+        emit(bench_sweep(endpoints))
+    else:
+        emit(bench_import([int(size) for size in args.sizes.split(',')]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Helpers shared by the benchmark runners."""
+import json
+import time
+
+
+def throughput(name, count, seconds, **extra):
+    """Result for a benchmark that processes ``count`` items in ``seconds``."""
+    return {'name': name, 'count': count, 'seconds': round(seconds, 3),
+            'per_second': round(count / seconds, 1) if seconds else None, **extra}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def latency(name, samples, **extra):
+    """Result for a benchmark timing individual operations, ``samples`` in seconds."""
+    return {'name': name, 'count': len(samples),
+            'p50_ms': round(percentile(samples, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+            'max_ms': round(max(samples) * 1000, 2), **extra}
+
+
+def timed(fn, repeat):
+    """Call ``fn`` ``repeat`` times and return the duration of each call."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def load_farm(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def emit(results):
+    """Write results to stdout for run.py, logs go to stderr."""
+    print(json.dumps(results))
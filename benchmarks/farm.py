@@ -0,0 +1,201 @@
+"""Local farm of TLS listeners used as probe targets by the benchmarks.
+
+Certificates are generated on start: a root CA, an intermediate and leaf
+certificates for ``localhost`` with varied expiry. Point ``SSL_CERT_FILE``
+at ``Farm.ca_file`` so the default SSL context of the probe trusts them.
+"""
+import asyncio
+import os
+import socket
+import ssl
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from ipaddress import ip_address
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+HOSTNAME = 'localhost'
+# Days until expiry of the leaf certificates served by valid endpoints
+LEAF_EXPIRY_DAYS = (3, 10, 25, 45, 80, 120, 200, 365)
+# Seconds a slow endpoint waits before starting the handshake
+SLOW_DELAY = 1.0
+
+# Endpoint kinds in the default farm mix, per 100 endpoints
+DEFAULT_MIX = {
+    'valid': 88,
+    'expired': 3,
+    'self_signed': 3,
+    'slow': 2,
+    'hanging': 2,
+    'refusing': 2,
+}
+
+
+def _name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+                      x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'certmon benchmark')])
+
+
+def _certificate(subject, key, issuer, issuer_key, not_before, not_after, ca=False):
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(_name(issuer))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_before)
+        .not_valid_after(not_after)
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    if not ca:
+        builder = builder.add_extension(x509.SubjectAlternativeName([
+            x509.DNSName(HOSTNAME), x509.IPAddress(ip_address('127.0.0.1'))
+        ]), critical=False)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def _pem(*items):
+    data = b''
+    for item in items:
+        if isinstance(item, x509.Certificate):
+            data += item.public_bytes(serialization.Encoding.PEM)
+        else:
+            data += item.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                       serialization.NoEncryption())
+    return data
+
+
+async def pipe(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+class Farm:
+    """TLS listeners on 127.0.0.1 serving a mix of healthy and broken endpoints.
+
+    The farm runs its own event loop in a background thread; ``endpoints``
+    lists ``{'url', 'kind'}`` dicts once :meth:`start` returns.
+    """
+
+    def __init__(self, size=200, mix=None):
+        self.size = size
+        self.mix = mix or DEFAULT_MIX
+        self.directory = tempfile.mkdtemp(prefix='certmon-farm-')
+        self.ca_file = os.path.join(self.directory, 'ca.pem')
+        self.endpoints = []
+        self._servers = []
+        self._loop = None
+        self._thread = None
+
+    def _generate(self):
+        now = datetime.utcnow()
+        root_key = ec.generate_private_key(ec.SECP256R1())
+        root = _certificate('certmon benchmark root', root_key, 'certmon benchmark root', root_key,
+                            now - timedelta(days=1), now + timedelta(days=3650), ca=True)
+        intermediate_key = ec.generate_private_key(ec.SECP256R1())
+        intermediate = _certificate('certmon benchmark intermediate', intermediate_key, 'certmon benchmark root',
+                                    root_key, now - timedelta(days=1), now + timedelta(days=1825), ca=True)
+        with open(self.ca_file, 'wb') as f:
+            f.write(_pem(root))
+
+        def context(name, not_before, not_after, self_signed=False):
+            key = ec.generate_private_key(ec.SECP256R1())
+            if self_signed:
+                chain = [_certificate(HOSTNAME, key, HOSTNAME, key, not_before, not_after)]
+            else:
+                chain = [_certificate(HOSTNAME, key, 'certmon benchmark intermediate', intermediate_key,
+                                      not_before, not_after), intermediate]
+            path = os.path.join(self.directory, f'{name}.pem')
+            with open(path, 'wb') as f:
+                f.write(_pem(key, *chain))
+            ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ctx.load_cert_chain(path)
+            return ctx
+
+        self._contexts = {
+            'valid': [context(f'valid-{days}', now - timedelta(days=30), now + timedelta(days=days))
+                      for days in LEAF_EXPIRY_DAYS],
+            'expired': [context('expired', now - timedelta(days=120), now - timedelta(days=2))],
+            'self_signed': [context('self-signed', now - timedelta(days=1), now + timedelta(days=90),
+                                    self_signed=True)],
+        }
+
+    def _kinds(self):
+        """Return the kind of every endpoint, each broken kind at least once and the rest valid."""
+        total = sum(self.mix.values())
+        kinds = []
+        for kind, share in self.mix.items():
+            if kind != 'valid':
+                kinds += [kind] * max(1, self.size * share // total)
+        return ['valid'] * max(self.size - len(kinds), 0) + kinds
+
+    async def _serve(self, kind, index):
+        contexts = self._contexts.get(kind)
+        context = contexts[index % len(contexts)] if contexts else None
+
+        async def hold(reader, writer):
+            # Hold the connection until the client hangs up, a hanging endpoint never answers
+            try:
+                await reader.read()
+            except (ConnectionError, ssl.SSLError, OSError):
+                pass
+            finally:
+                writer.close()
+
+        if kind == 'slow':
+            # Relay to a valid listener, holding back its first response
+            upstream_port = await self._serve('valid', index)
+
+            async def relay(reader, writer):
+                await asyncio.sleep(SLOW_DELAY)
+                try:
+                    upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', upstream_port)
+                except OSError:
+                    writer.close()
+                    return
+                await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+
+            handle, context = relay, None
+        else:
+            handle = hold
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0, ssl=None if kind == 'hanging' else context)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def _start(self):
+        for index, kind in enumerate(self._kinds()):
+            if kind == 'refusing':
+                # Take a free port and release it so nothing listens there
+                with socket.socket() as sock:
+                    sock.bind(('127.0.0.1', 0))
+                    port = sock.getsockname()[1]
+            else:
+                port = await self._serve(kind, index)
+            self.endpoints.append({'url': f'https://{HOSTNAME}:{port}', 'kind': kind})
+
+    def start(self):
+        self._generate()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        async def close():
+            for server in self._servers:
+                server.close()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
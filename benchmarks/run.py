@@ -0,0 +1,132 @@
+"""Run the certmon benchmark suite and write machine-readable results.
+
+Starts a local TLS farm, runs the worker and API benchmarks against the
+Postgres and Redis given by DATABASE_URL and REDIS_URL, and writes one
+JSON document. Use a scratch database with the migrations applied, the
+benchmarks insert and delete rows.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline main.json --tolerance 0.2
+
+With ``--baseline`` the exit status is 1 when a throughput dropped or a
+p95 latency rose by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from farm import Farm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+
+# Settings applied to every benchmark process
+BENCHMARK_ENV = {
+    # Hanging farm endpoints should not dominate the wall time
+    'PROBE_CONNECT_TIMEOUT': '2',
+    'PROBE_HANDSHAKE_TIMEOUT': '2',
+    # Measure probing and Postgres, not the caches in front of them
+    'PROBE_CACHE_TTL': '0',
+    'RESPONSE_CACHE_TTL': '0',
+    # Every farm endpoint is on localhost, which would otherwise be one rate limited host group
+    'HOST_RATE_LIMIT': '1000000',
+    'HOST_RATE_BURST': '1000000',
+    'WORKER_METRICS_PORT': '0',
+}
+
+
+def run(script, service, args, env):
+    env = {**env, 'PYTHONPATH': os.pathsep.join([os.path.join(ROOT, 'services', service), BENCHMARKS])}
+    completed = subprocess.run([sys.executable, os.path.join(BENCHMARKS, script), *args],
+                               env=env, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, tolerance):
+    """Return a message for every result that got worse than its baseline by more than ``tolerance``."""
+    previous = {result['name']: result for result in baseline['results']}
+    messages = []
+    for result in results:
+        before = previous.get(result['name'])
+        if not before:
+            continue
+        if result.get('per_second') and before.get('per_second'):
+            if result['per_second'] < before['per_second'] * (1 - tolerance):
+                messages.append(f"{result['name']}: {result['per_second']}/s, was {before['per_second']}/s")
+        elif result.get('p95_ms') and before.get('p95_ms'):
+            if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                messages.append(f"{result['name']}: p95 {result['p95_ms']} ms, was {before['p95_ms']} ms")
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', type=int, default=200, help='TLS listeners in the farm')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='CSV rows per import benchmark')
+    parser.add_argument('--api-rows', type=int, default=10000, help='certificates seeded for the API benchmarks')
+    parser.add_argument('--only', default='probe,sweep,import,api', help='benchmarks to run')
+    parser.add_argument('--output', help='file to write the results to, stdout by default')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+    only = set(args.only.split(','))
+
+    farm = Farm(args.endpoints).start()
+    farm_file = os.path.join(farm.directory, 'endpoints.json')
+    with open(farm_file, 'w') as f:
+        json.dump(farm.endpoints, f)
+    env = {**os.environ, **BENCHMARK_ENV, 'SSL_CERT_FILE': farm.ca_file}
+
+    results = []
+    try:
+        for benchmark in ('probe', 'sweep', 'import'):
+            if benchmark in only:
+                print(f'Running {benchmark} benchmark', file=sys.stderr)
+                results += run('bench_worker.py', 'worker', [benchmark, '--farm', farm_file, '--sizes', args.sizes],
+                               env)
+        if 'api' in only:
+            print('Running api benchmark', file=sys.stderr)
+            results += run('bench_api.py', 'api', ['--rows', str(args.api_rows)], env)
+    finally:
+        farm.stop()
+
+    document = {
+        'started_at': datetime.utcnow().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'farm': {'endpoints': args.endpoints,
+                 'kinds': {kind: sum(1 for e in farm.endpoints if e['kind'] == kind)
+                           for kind in {e['kind'] for e in farm.endpoints}}},
+        'results': results,
+    }
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            messages = regressions(results, json.load(f), args.tolerance)
+        for message in messages:
+            print(f'Regression: {message}', file=sys.stderr)
+        if messages:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,10 +15,13 @@ def create_app():
     # Configure the Flask application
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    from .database import engine_options
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24))
 
     # Initialize extensions
-    CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE"], "allow_headers": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE"], "allow_headers": "*",
+                                 "expose_headers": ["X-Next-Cursor", "Link", "ETag", "Last-Modified"]}})
     db.init_app(app)
     
     # Import models before initializing migrations
@@ -29,9 +32,11 @@ def create_app():
     from .api import api_bp
     app.register_blueprint(api_bp)  # Remove url_prefix to match nginx config
 
-    # Add prometheus metrics endpoint
+    # Add prometheus metrics endpoint and per-request instrumentation
+    from . import metrics
+    metrics.init_app(app)
     app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {
-        '/metrics': make_wsgi_app()
+        '/metrics': make_wsgi_app(metrics.metrics_registry())
     })
 
     @app.route('/health')
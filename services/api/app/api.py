@@ -1,10 +1,17 @@
-from flask import Blueprint, request, jsonify
-from .models import Certificate, db
-from .tasks import check_certificate
-import pandas as pd
-from io import StringIO
+from flask import Blueprint, Response, request, jsonify, stream_with_context, url_for
+from .models import Certificate, CertificateHistory, ImportJob, db
+from .queries import QueryError, list_page, parse_limit
+from .store import redis_client, bump_generation, IMPORT_UPLOAD_KEY, IMPORT_UPLOAD_TTL
+from .caching import conditional
+from .summary import count_certificates, get_summary
+from .events import publish_events, stream_events
+from .tasks import schedule_check, publish_checks, process_import
+from .export import EXPORT_FORMATS, export_query, export_rows, parse_format
+from .settings import get_settings, parse_settings, required_sweep_rate, save_settings, spread_next_checks
+from .bulk import add_certificates, delete_certificates, parse_items, parse_selection, select_certificate_ids
 from datetime import datetime
 import logging
+import uuid
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,15 +19,72 @@ logger = logging.getLogger(__name__)
 
 api_bp = Blueprint('api', __name__)
 
+# Bytes copied from an uploaded CSV to Redis per write
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @api_bp.route('/certificates', methods=['GET'])
+@conditional
 def list_certificates():
     try:
-        certificates = Certificate.query.all()
-        return jsonify([cert.to_dict() for cert in certificates])
+        certificates, next_cursor = list_page(request.args)
+        response = jsonify(certificates)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+            next_url = url_for('api.list_certificates', **{**request.args.to_dict(), 'cursor': next_cursor})
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+        return response
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing certificates: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/certificates/summary', methods=['GET'])
+@conditional
+def certificate_summary():
+    try:
+        return jsonify(get_summary())
+    except Exception as e:
+        logger.error(f"Error getting certificate summary: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/certificates/export', methods=['GET'])
+def export_certificates():
+    try:
+        # Parameters are checked before streaming starts, afterwards the status can no longer change
+        export_format = parse_format(request.args.get('format'))
+        fields, stmt = export_query(request.args)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            yield from export_rows(fields, stmt, export_format)
+        except Exception as e:
+            # The response is already under way, a truncated body is all the client can be told
+            logger.error(f"Error exporting certificates: {str(e)}")
+            raise
+
+    filename = f"certificates-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+
+@api_bp.route('/certificates/events', methods=['GET'])
+def certificate_events():
+    # Browsers send Last-Event-ID when reconnecting, the query parameter is for other clients
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    def generate():
+        try:
+            yield from stream_events(last_event_id)
+        except Exception as e:
+            # The client reconnects and resumes from the last event it received
+            logger.error(f"Error streaming certificate events: {str(e)}")
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @api_bp.route('/certificates', methods=['POST'])
 def add_certificate():
     try:
@@ -45,11 +109,14 @@ def add_certificate():
             updated_at=datetime.utcnow()
         )
         db.session.add(cert)
+        count_certificates([cert], 1)
         db.session.commit()
+        bump_generation()
+        publish_events('created', [{'id': cert.id, 'status': cert.status}])
 
         # Trigger async certificate check
         logger.info(f"Triggering certificate check for ID: {cert.id}")
-        check_certificate.apply_async(args=[cert.id], task_id=f'check_certificate_{cert.id}', queue='celery')
+        schedule_check(cert.id)
 
         return jsonify(cert.to_dict()), 201
     except Exception as e:
@@ -57,6 +124,72 @@ def add_certificate():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/certificates/bulk', methods=['POST'])
+def add_certificates_bulk():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+
+        urls = parse_items(data, 'urls', str)
+        created = add_certificates(urls)
+        db.session.commit()
+        if created:
+            bump_generation()
+            publish_events('created', [{'id': cert_id, 'status': 'pending'} for cert_id, _ in created])
+
+        # Bulk checks go to the default queue so they cannot crowd out single user requests
+        queued = publish_checks([cert_id for cert_id, _ in created])
+        new_urls = {url for _, url in created}
+        return jsonify({
+            'created': [{'id': cert_id, 'url': url} for cert_id, url in created],
+            'existing': [url for url in urls if url not in new_urls],
+            'queued': queued
+        })
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error adding certificates in bulk: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/certificates/bulk', methods=['DELETE'])
+def delete_certificates_bulk():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+
+        deleted = delete_certificates(parse_selection(data))
+        db.session.commit()
+        if deleted:
+            bump_generation()
+            publish_events('deleted', [{'id': cert_id} for cert_id in deleted])
+        return jsonify({'deleted': deleted})
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error deleting certificates in bulk: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/certificates/refresh', methods=['POST'])
+def refresh_certificates_bulk():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+
+        cert_ids = select_certificate_ids(parse_selection(data))
+        # Certificates with a check already queued or running are skipped
+        queued = publish_checks(cert_ids)
+        return jsonify({'matched': len(cert_ids), 'queued': queued})
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error refreshing certificates in bulk: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/certificates/import', methods=['POST'])
 def import_certificates():
     try:
@@ -67,50 +200,42 @@ def import_certificates():
         if file.filename == '' or not file.filename.endswith('.csv'):
             return jsonify({'error': 'Invalid file format'}), 400
 
-        content = file.read().decode('utf-8')
-        df = pd.read_csv(StringIO(content))
-        
-        if 'url' not in df.columns:
-            return jsonify({'error': 'CSV must contain a "url" column'}), 400
-
-        results = {
-            'added': 0,
-            'skipped': 0,
-            'errors': []
-        }
-
-        for url in df['url']:
-            try:
-                existing = Certificate.query.filter_by(url=url).first()
-                if existing:
-                    results['skipped'] += 1
-                    continue
-
-                cert = Certificate(
-                    url=url,
-                    status='pending',
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                db.session.add(cert)
-                db.session.commit()
-
-                # Trigger async certificate check
-                check_certificate.apply_async(args=[cert.id], task_id=f'check_certificate_{cert.id}', queue='celery')
-                
-                results['added'] += 1
-            except Exception as e:
-                results['errors'].append(f'Error adding {url}: {str(e)}')
-                db.session.rollback()
-
-        return jsonify(results), 201
+        # Park the upload in Redis and let the worker service process it in the background
+        job_id = str(uuid.uuid4())
+        key = IMPORT_UPLOAD_KEY.format(job_id)
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            redis_client.append(key, chunk)
+        redis_client.expire(key, IMPORT_UPLOAD_TTL)
+
+        job = ImportJob(id=job_id, filename=file.filename, status='queued')
+        db.session.add(job)
+        db.session.commit()
+        process_import.apply_async(args=[job_id])
+
+        return jsonify({**job.to_dict(), 'status_url': url_for('api.get_import', job_id=job_id)}), 202
 
     except Exception as e:
         logger.error(f"Error importing certificates: {str(e)}")
+        db.session.rollback()
         return jsonify({'error': f'Error processing CSV: {str(e)}'}), 400
 
+@api_bp.route('/imports/<job_id>', methods=['GET'])
+def get_import(job_id):
+    try:
+        job = ImportJob.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Import job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting import job {job_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # Get certificate by ID
 @api_bp.route('/certificates/<int:cert_id>', methods=['GET'])
+@conditional
 def get_certificate(cert_id):
     try:
         cert = Certificate.query.get(cert_id)
@@ -121,15 +246,39 @@ def get_certificate(cert_id):
         logger.error(f"Error getting certificate {cert_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/certificates/<int:cert_id>/history', methods=['GET'])
+@conditional
+def get_certificate_history(cert_id):
+    try:
+        cert = Certificate.query.get(cert_id)
+        if not cert:
+            return jsonify({'error': 'Certificate not found'}), 404
+        runs = (
+            CertificateHistory.query
+            .filter(CertificateHistory.certificate_id == cert_id)
+            .order_by(CertificateHistory.started_at.desc())
+            .limit(parse_limit(request.args.get('limit')))
+            .all()
+        )
+        # Newest first, each run ends where the next newer one starts
+        ended = [None] + [run.started_at for run in runs[:-1]]
+        return jsonify([run.to_dict(ended_at) for run, ended_at in zip(runs, ended)])
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting history for certificate {cert_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # Delete certificate by ID
 @api_bp.route('/certificates/<int:cert_id>/delete', methods=['DELETE'])
 def delete_certificate(cert_id):
     try:
-        cert = Certificate.query.get(cert_id)
-        if not cert:
+        # The summary is decremented by the row as deleted, not as read before
+        if not delete_certificates(Certificate.id == cert_id):
             return jsonify({'error': 'Certificate not found'}), 404
-        db.session.delete(cert)
         db.session.commit()
+        bump_generation()
+        publish_events('deleted', [{'id': cert_id}])
         return jsonify({'message': 'Certificate deleted successfully'})
     except Exception as e:
         logger.error(f"Error deleting certificate {cert_id}: {str(e)}")
@@ -140,7 +289,8 @@ def delete_certificate(cert_id):
 def refresh_certificate(cert_id):
     try:
         cert = Certificate.query.get_or_404(cert_id)
-        check_certificate.apply_async(args=[cert.id], task_id=f'check_certificate_{cert.id}', queue='celery')
+        if not schedule_check(cert.id):
+            return jsonify({'message': 'Certificate refresh already scheduled'})
         return jsonify({'message': 'Certificate refresh scheduled'})
     except Exception as e:
         logger.error(f"Error refreshing certificate {cert_id}: {str(e)}")
@@ -162,7 +312,29 @@ def test_db():
             'message': str(e)
         }), 500
 
-# Add new endpoint for updating refresh interval
+@api_bp.route('/settings', methods=['GET'])
+def get_schedule_settings():
+    try:
+        settings = get_settings()
+        return jsonify({**settings, 'required_sweep_rate': required_sweep_rate(settings)})
+    except Exception as e:
+        logger.error(f"Error getting settings: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/settings', methods=['PUT'])
+def update_schedule_settings():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        return jsonify(update_settings(parse_settings(data)))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error updating settings: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/settings/refresh-interval', methods=['POST'])
 def update_refresh_interval():
     try:
@@ -171,18 +343,23 @@ def update_refresh_interval():
             return jsonify({'error': 'Interval is required'}), 400
 
         interval = int(data['interval'])
-        if interval not in [1, 4, 8, 12, 16, 24]:
-            return jsonify({'error': 'Invalid interval value'}), 400
-
-        # Update Celery beat schedule
-        app.conf.beat_schedule = {
-            'check-certificates-every-n-hours': {
-                'task': 'app.tasks.check_all_certificates',
-                'schedule': interval * 3600,  # Convert hours to seconds
-            },
-        }
-
+        update_settings(parse_settings({'check_interval_hours': interval}))
         return jsonify({'message': f'Check interval updated to {interval} hours'}), 200
+    except (QueryError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error updating refresh interval: {str(e)}")
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+def update_settings(settings):
+    """Store new schedule settings, the worker's dispatcher picks them up on its next runs."""
+    rescheduled = 0
+    if 'check_interval_hours' in settings:
+        rescheduled = spread_next_checks(settings['check_interval_hours'])
+    db.session.commit()
+    save_settings(settings)
+    if rescheduled:
+        bump_generation()
+    logger.info(f"Updated settings {settings}, rescheduled {rescheduled} certificates")
+    return {**get_settings(), 'rescheduled': rescheduled}
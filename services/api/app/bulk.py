@@ -0,0 +1,97 @@
+import os
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from .models import Certificate, db
+from .queries import QueryError, apply_filters
+from .summary import apply_summary_deltas, summary_key
+
+# URLs or IDs accepted by one bulk request
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '10000'))
+# Rows per INSERT statement, keeping the bind parameters well under the protocol limit
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# List query parameters accepted in a bulk filter
+FILTER_PARAMS = ('url', 'subject', 'serial_number', 'status', 'error_class', 'issuer', 'chain', 'san',
+                 'expiring_within')
+
+
+def parse_items(data, key, kind):
+    """Return the de-duplicated list under ``key``, each item an instance of ``kind``."""
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        raise QueryError(f'{key} must be a non-empty list')
+    if len(items) > BULK_MAX_ITEMS:
+        raise QueryError(f'At most {BULK_MAX_ITEMS} {key} per request')
+    if not all(isinstance(item, kind) and not isinstance(item, bool) and item != '' for item in items):
+        raise QueryError(f'{key} must contain only {kind.__name__} values')
+    # dict.fromkeys drops duplicates but keeps order
+    return list(dict.fromkeys(items))
+
+
+def parse_selection(data):
+    """Return a condition selecting the certificates named by a bulk request body.
+
+    The body holds exactly one of ``ids``, ``urls`` or ``filter``. A filter
+    takes the query parameters of the list view and must set at least one,
+    so an empty body can never select every certificate.
+    """
+    given = [key for key in ('ids', 'urls', 'filter') if key in data]
+    if len(given) != 1:
+        raise QueryError('Provide exactly one of ids, urls or filter')
+    if given[0] == 'ids':
+        return Certificate.id.in_(parse_items(data, 'ids', int))
+    if given[0] == 'urls':
+        return Certificate.url.in_(parse_items(data, 'urls', str))
+
+    filters = data['filter']
+    if not isinstance(filters, dict):
+        raise QueryError('filter must be an object')
+    unknown = [key for key in filters if key not in FILTER_PARAMS]
+    if unknown:
+        raise QueryError(f'Unknown filters: {", ".join(unknown)}')
+    filters = {key: str(value) for key, value in filters.items() if value not in (None, '')}
+    if not filters:
+        raise QueryError(f'filter must set at least one of {", ".join(FILTER_PARAMS)}')
+    return Certificate.id.in_(apply_filters(select(Certificate.id), filters))
+
+
+def add_certificates(urls):
+    """Insert certificates for the ``urls`` not monitored yet in the current transaction.
+
+    Returns ``(id, url)`` of each certificate created.
+    """
+    now = datetime.utcnow()
+    table = Certificate.__table__
+    created = []
+    for start in range(0, len(urls), BULK_INSERT_CHUNK_SIZE):
+        stmt = (
+            insert(table)
+            .values([
+                {'url': url, 'status': 'pending', 'created_at': now, 'updated_at': now, 'next_check_at': now}
+                for url in urls[start:start + BULK_INSERT_CHUNK_SIZE]
+            ])
+            .on_conflict_do_nothing(index_elements=['url'])
+            .returning(table.c.id, table.c.url)
+        )
+        created += db.session.execute(stmt).all()
+    apply_summary_deltas({summary_key('pending', None, None): len(created)})
+    return created
+
+
+def delete_certificates(condition):
+    """Delete the certificates matching ``condition`` in the current transaction and return their IDs."""
+    table = Certificate.__table__
+    rows = db.session.execute(
+        delete(table).where(condition).returning(table.c.id, table.c.status, table.c.issuer, table.c.valid_until)
+    ).all()
+    deltas = Counter()
+    for row in rows:
+        deltas[summary_key(row.status, row.issuer, row.valid_until)] -= 1
+    apply_summary_deltas(deltas)
+    return [row.id for row in rows]
+
+
+def select_certificate_ids(condition):
+    return list(db.session.execute(select(Certificate.id).where(condition).order_by(Certificate.id)).scalars())
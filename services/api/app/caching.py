@@ -0,0 +1,98 @@
+import os
+import time
+import hashlib
+import logging
+import functools
+from datetime import datetime, timezone
+from flask import request, make_response, Response
+from .store import redis_client, GENERATION_KEY, GENERATION_AT_KEY
+
+logger = logging.getLogger(__name__)
+
+# Seconds a serialized response is kept in Redis
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+# Checks that find an unchanged certificate do not bump the generation, so
+# validators also roll over after this many seconds to refresh last_checked
+ETAG_MAX_AGE = int(os.getenv('ETAG_MAX_AGE', '300'))
+
+RESPONSE_CACHE_KEY = 'certmon:response:{}'
+# Response headers stored along with a cached body
+CACHED_HEADERS = ('X-Next-Cursor', 'Link')
+
+
+def current_version(now=None):
+    """Return ``(version, last_modified)`` for the certificate collection, or None without Redis."""
+    now = now or time.time()
+    try:
+        generation, modified_at = redis_client.mget([GENERATION_KEY, GENERATION_AT_KEY])
+    except Exception as e:
+        logger.error(f"Error reading the certificate generation: {str(e)}")
+        return None
+    epoch = int(now // ETAG_MAX_AGE)
+    last_modified = max(int(modified_at or 0), epoch * ETAG_MAX_AGE)
+    return f'{int(generation or 0)}.{epoch}', datetime.fromtimestamp(last_modified, timezone.utc)
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return bool(request.if_modified_since and last_modified <= request.if_modified_since)
+
+
+def load_response(key):
+    try:
+        cached = redis_client.hgetall(key)
+    except Exception as e:
+        logger.error(f"Error reading response cache: {str(e)}")
+        return None
+    if not cached:
+        return None
+    body = cached.pop(b'body')
+    headers = {name.decode(): value.decode() for name, value in cached.items()}
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def store_response(key, response):
+    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.hset(key, mapping={'body': response.get_data(), **headers})
+            pipe.expire(key, RESPONSE_CACHE_TTL)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error writing response cache: {str(e)}")
+
+
+def conditional(view):
+    """Serve a GET view with ETag/Last-Modified validators and a short-lived Redis response cache.
+
+    Validators are derived from the generation counter that every writer
+    bumps, so clients holding a current copy get a 304 without touching
+    Postgres and identical requests share one serialized body.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_version()
+        if version is None:
+            return view(*args, **kwargs)
+        generation, last_modified = version
+        etag = hashlib.sha1(f'{generation}:{request.full_path}'.encode('utf-8')).hexdigest()
+
+        if not_modified(etag, last_modified):
+            response = Response(status=304)
+        else:
+            key = RESPONSE_CACHE_KEY.format(etag)
+            response = load_response(key) if RESPONSE_CACHE_TTL > 0 else None
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if RESPONSE_CACHE_TTL > 0:
+                    store_response(key, response)
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        # Clients may keep the response but must revalidate it before use
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
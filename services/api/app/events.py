@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import logging
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients resuming with Last-Event-ID, trimmed approximately
+EVENTS_MAX_LEN = int(os.getenv('EVENTS_MAX_LEN', '10000'))
+# A connection is closed after this many seconds, the browser reconnects with Last-Event-ID
+SSE_MAX_DURATION = int(os.getenv('SSE_MAX_DURATION', '300'))
+# Seconds between keepalive comments on an idle connection
+SSE_KEEPALIVE = int(os.getenv('SSE_KEEPALIVE', '15'))
+# Milliseconds the browser waits before reconnecting
+SSE_RETRY = 3000
+
+# Redis stream written by the worker and the API, see worker app/events.py
+EVENTS_STREAM_KEY = 'certmon:events'
+
+
+def publish_events(event_type, events):
+    """Append events to the stream after the change they describe was committed."""
+    if not events:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(EVENTS_STREAM_KEY, {'type': event_type, 'data': json.dumps(event)},
+                          maxlen=EVENTS_MAX_LEN, approximate=True)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error publishing {len(events)} certificate events: {str(e)}")
+
+
+def stream_id(value):
+    """Parse a Redis stream ID into a comparable tuple, or None if it is not one."""
+    try:
+        milliseconds, _, sequence = value.partition('-')
+        return int(milliseconds), int(sequence or 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_event(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+
+
+def stream_events(last_event_id=None, max_duration=SSE_MAX_DURATION):
+    """Yield server-sent events for certificate changes after ``last_event_id``.
+
+    Without a valid ``last_event_id`` only new events are sent. When the
+    requested event has already been trimmed from the stream a ``reset``
+    event tells the client to reload instead of silently missing changes.
+    """
+    yield f'retry: {SSE_RETRY}\n\n'
+    requested = stream_id(last_event_id)
+    if requested:
+        oldest = redis_client.xrange(EVENTS_STREAM_KEY, count=1)
+        if oldest and stream_id(oldest[0][0].decode()) > requested:
+            yield format_event(last_event_id, 'reset', '{}')
+        last_id = last_event_id
+    else:
+        latest = redis_client.xrevrange(EVENTS_STREAM_KEY, count=1)
+        last_id = latest[0][0].decode() if latest else '0-0'
+
+    deadline = time.monotonic() + max_duration
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        block = int(min(SSE_KEEPALIVE, remaining) * 1000)
+        replies = redis_client.xread({EVENTS_STREAM_KEY: last_id}, count=100, block=block)
+        if not replies:
+            # Comments keep proxies from closing an idle connection
+            yield ': keepalive\n\n'
+            continue
+        for event_id, fields in replies[0][1]:
+            last_id = event_id.decode()
+            yield format_event(last_id, fields[b'type'].decode(), fields[b'data'].decode())
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from .models import Certificate, db
+from .queries import QueryError, apply_filters, parse_fields
+
+# Rows fetched from the server-side cursor and written to the client at a time
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_format(value):
+    value = value or 'ndjson'
+    if value not in EXPORT_FORMATS:
+        raise QueryError(f'format must be one of {", ".join(EXPORT_FORMATS)}')
+    return value
+
+
+def export_query(args):
+    """Return the fields and the statement exporting the certificates matching the list filters."""
+    fields = parse_fields(args.get('fields'))
+    stmt = apply_filters(db.select(*Certificate.columns_for(fields)), args).order_by(Certificate.id)
+    # yield_per streams from a server-side cursor instead of buffering the whole result
+    return fields, stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+def export_rows(fields, stmt, export_format):
+    """Yield the export body one chunk of rows at a time, memory use does not depend on the result size."""
+    now = datetime.utcnow()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(fields)
+
+    for rows in db.session.execute(stmt).partitions():
+        for row in rows:
+            data = Certificate.serialize(row, fields, now)
+            if export_format == 'csv':
+                writer.writerow([data[field] for field in fields])
+            else:
+                buffer.write(json.dumps(data) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # The CSV header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,48 @@
+import os
+import logging
+from .store import redis_client
+from .routing import QUEUE_HIGH, QUEUE_DEFAULT
+
+logger = logging.getLogger(__name__)
+
+# A queued or running check holds its lease until it finishes or the lease expires
+CHECK_LEASE_TTL = int(os.getenv('CHECK_LEASE_TTL', '900'))
+
+# Holds the queue the check was published on, see worker app/leases.py
+CHECK_LEASE_KEY = 'certmon:check-lease:{}'
+
+
+def acquire_check_leases(cert_ids, queue=QUEUE_DEFAULT):
+    """Take the check lease for each certificate and return the IDs whose lease was free.
+
+    Certificates whose lease is already held have a check queued or in
+    flight, which will absorb this request. The lease records ``queue``.
+    """
+    cert_ids = list(cert_ids)
+    if not cert_ids:
+        return []
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for cert_id in cert_ids:
+                pipe.set(CHECK_LEASE_KEY.format(cert_id), queue, nx=True, ex=CHECK_LEASE_TTL)
+            acquired = pipe.execute()
+    except Exception as e:
+        # Without Redis we cannot dedupe, a duplicate check is better than a missed one
+        logger.error(f"Error acquiring check leases: {str(e)}")
+        return cert_ids
+    return [cert_id for cert_id, ok in zip(cert_ids, acquired) if ok]
+
+
+def acquire_priority_lease(cert_id):
+    """Take the check lease of a certificate for a high priority check and return whether one was needed.
+
+    A lease held by a sweep on a lower priority queue is taken over, the
+    user's check should not wait behind the sweep. Only a high priority
+    check already queued or in flight absorbs this request.
+    """
+    try:
+        previous = redis_client.set(CHECK_LEASE_KEY.format(cert_id), QUEUE_HIGH, ex=CHECK_LEASE_TTL, get=True)
+    except Exception as e:
+        logger.error(f"Error acquiring check lease: {str(e)}")
+        return True
+    return previous != QUEUE_HIGH.encode()
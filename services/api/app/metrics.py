@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from .routing import QUEUES
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with the route that issued them
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# Requests issuing more statements than this are logged, usually a query per row
+QUERY_COUNT_WARNING = int(os.getenv('QUERY_COUNT_WARNING', '50'))
+# Set when gunicorn runs several worker processes so their samples are aggregated
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+POOL_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+REQUEST_SECONDS = Histogram('certmon_api_request_seconds', 'Time to produce a response, per route',
+                            ['method', 'route', 'status'])
+RESPONSE_BYTES = Histogram('certmon_api_response_bytes', 'Size of response bodies, per route',
+                           ['method', 'route'], buckets=SIZE_BUCKETS)
+REQUEST_QUERIES = Histogram('certmon_api_request_queries', 'SQL statements issued per request',
+                            ['method', 'route'], buckets=QUERY_COUNT_BUCKETS)
+QUERY_SECONDS = Histogram('certmon_api_query_seconds', 'SQL statement execution time, per route', ['route'])
+SLOW_QUERIES = Counter('certmon_api_slow_queries_total', 'SQL statements over SLOW_QUERY_MS', ['route'])
+DB_POOL_WAIT_SECONDS = Histogram('certmon_db_pool_wait_seconds', 'Time waiting to check out a database connection',
+                                 buckets=POOL_BUCKETS)
+DB_POOL_TIMEOUTS = Counter('certmon_db_pool_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT')
+DB_CONNECTION_HELD_SECONDS = Histogram('certmon_db_connection_held_seconds',
+                                       'Time a database connection stayed checked out', buckets=POOL_BUCKETS)
+DB_CONNECTIONS = Gauge('certmon_db_connections', 'Database connections open or checked out', ['state'],
+                       multiprocess_mode='livesum')
+
+
+class QueueDepthCollector:
+    """Report the number of messages waiting in each Celery queue on every scrape."""
+
+    def family(self):
+        return GaugeMetricFamily('certmon_queue_depth', 'Messages waiting in a Celery queue', labels=['queue'])
+
+    def describe(self):
+        # Lets registration check the name without reading Redis
+        return [self.family()]
+
+    def collect(self):
+        depth = self.family()
+        try:
+            # With the Redis transport every queue is a list named after it
+            with redis_client.pipeline(transaction=False) as pipe:
+                for queue in QUEUES:
+                    pipe.llen(queue)
+                lengths = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading queue depths: {str(e)}")
+            return
+        for queue, length in zip(QUEUES, lengths):
+            depth.add_metric([queue], length)
+        yield depth
+
+
+QUEUE_DEPTH = QueueDepthCollector()
+try:
+    REGISTRY.register(QUEUE_DEPTH)
+except ValueError:
+    # Already registered by an earlier import of this module
+    pass
+
+
+def current_route():
+    # The rule rather than the path keeps label cardinality bounded
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def metrics_registry():
+    """Return the registry /metrics is served from, aggregating every gunicorn worker if configured."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(QUEUE_DEPTH)
+    return registry
+
+
+def init_app(app):
+    """Record latency, response size and SQL statements for every request."""
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.query_count = 0
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        route = current_route()
+        # Streamed responses are timed until their headers are sent
+        REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+        if response.content_length is not None:
+            RESPONSE_BYTES.labels(request.method, route).observe(response.content_length)
+        queries = g.pop('query_count', 0)
+        REQUEST_QUERIES.labels(request.method, route).observe(queries)
+        if queries > QUERY_COUNT_WARNING:
+            logger.warning(f"{request.method} {route} issued {queries} SQL statements")
+        return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    route = 'none'
+    if has_request_context():
+        route = current_route()
+        g.query_count = g.get('query_count', 0) + 1
+    QUERY_SECONDS.labels(route).observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.labels(route).inc()
+        logger.warning(f"Slow query ({elapsed * 1000:.0f} ms) on {route}: {' '.join(statement.split())[:500]}")
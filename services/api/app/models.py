@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 from . import db
 
 class Certificate(db.Model):
@@ -13,19 +14,151 @@ class Certificate(db.Model):
     valid_until = db.Column(db.DateTime)
     last_checked = db.Column(db.DateTime)
     status = db.Column(db.String(50))  # valid, expired, error
+    fingerprint = db.Column(db.String(64), index=True)  # SHA-256 of the leaf certificate
+    error_class = db.Column(db.String(32))  # dns, refused, connect_timeout, handshake, untrusted, ...
+    error_message = db.Column(db.String(255))
+    error_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_check_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                              server_default=db.func.now(), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Keyset pagination walks (filter column, id)
+        db.Index('ix_certificates_status_id', 'status', 'id'),
+        db.Index('ix_certificates_issuer_id', 'issuer', 'id'),
+        db.Index('ix_certificates_valid_until_id', 'valid_until', 'id'),
+    )
+
+    # Fields that can be returned by the API, in response order
+    FIELDS = ('id', 'url', 'issuer', 'subject', 'serial_number', 'fingerprint', 'valid_from', 'valid_until',
+              'last_checked', 'status', 'error_class', 'error_message', 'next_check_at', 'days_remaining')
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Return the columns needed to serialize ``fields``."""
+        names = {'valid_until' if field == 'days_remaining' else field for field in fields}
+        return [getattr(cls, name) for name in cls.FIELDS if name in names]
+
+    @staticmethod
+    def serialize(row, fields=None, now=None):
+        """Serialize a certificate or a row holding a subset of its columns."""
+        now = now or datetime.utcnow()
+        data = {}
+        for field in fields or Certificate.FIELDS:
+            if field == 'days_remaining':
+                data[field] = (row.valid_until - now).days if row.valid_until else None
+                continue
+            value = getattr(row, field)
+            data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+    def to_dict(self, fields=None):
+        return Certificate.serialize(self, fields)
+
+
+class ChainCertificate(db.Model):
+    """A certificate seen in a presented chain, stored once however many endpoints present it."""
+    __tablename__ = 'chain_certificates'
+
+    fingerprint = db.Column(db.String(64), primary_key=True)
+    subject = db.Column(db.String(255))
+    issuer = db.Column(db.String(255))
+    serial_number = db.Column(db.String(255))
+    valid_from = db.Column(db.DateTime)
+    valid_until = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CertificateChainLink(db.Model):
+    """Position of a chain certificate in the chain an endpoint presents, the leaf is position 0."""
+    __tablename__ = 'certificate_chain_links'
+
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.String(64), db.ForeignKey('chain_certificates.fingerprint'), nullable=False,
+                            index=True)
+
+
+class CertificateSan(db.Model):
+    __tablename__ = 'certificate_sans'
+
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(255), primary_key=True, index=True)
+
+
+class CertificateHistory(db.Model):
+    """One run of identical check outcomes, written when the fingerprint or status changes.
+
+    A run ends where the certificate's next run starts; the current run
+    continues up to the certificate's ``last_checked``.
+    """
+    __tablename__ = 'certificate_history'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (started_at)'}
+
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    started_at = db.Column(db.DateTime, primary_key=True)
+    fingerprint = db.Column(db.String(64))
+    status = db.Column(db.String(50))
+    error_class = db.Column(db.String(32))
+    serial_number = db.Column(db.String(255))
+    issuer = db.Column(db.String(255))
+    valid_until = db.Column(db.DateTime)
+
+    def to_dict(self, ended_at=None):
+        return {
+            'started_at': self.started_at.isoformat(),
+            'ended_at': ended_at.isoformat() if ended_at else None,
+            'fingerprint': self.fingerprint,
+            'status': self.status,
+            'error_class': self.error_class,
+            'serial_number': self.serial_number,
+            'issuer': self.issuer,
+            'valid_until': self.valid_until.isoformat() if self.valid_until else None
+        }
+
+
+class CertificateSummary(db.Model):
+    """Certificate counts per status, issuer and expiry day, kept current by every writer."""
+    __tablename__ = 'certificate_summary'
+
+    status = db.Column(db.String(50), primary_key=True)
+    issuer = db.Column(db.String(255), primary_key=True)  # '' when unknown
+    expires_on = db.Column(db.Date, primary_key=True)  # date.max when unknown
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.String(36), primary_key=True)
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False)  # queued, running, completed, failed
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    rows_added = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    rows_errored = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of the first error messages
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
     def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
         return {
             'id': self.id,
-            'url': self.url,
-            'issuer': self.issuer,
-            'subject': self.subject,
-            'serial_number': self.serial_number,
-            'valid_from': self.valid_from.isoformat() if self.valid_from else None,
-            'valid_until': self.valid_until.isoformat() if self.valid_until else None,
-            'last_checked': self.last_checked.isoformat() if self.last_checked else None,
+            'filename': self.filename,
             'status': self.status,
-            'days_remaining': (self.valid_until - datetime.utcnow()).days if self.valid_until else None
+            'rows_parsed': self.rows_parsed,
+            'rows_added': self.rows_added,
+            'rows_skipped': self.rows_skipped,
+            'rows_errored': self.rows_errored,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'rows_per_second': round(self.rows_parsed / elapsed, 1) if elapsed else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
         }
@@ -0,0 +1,166 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from .models import Certificate, CertificateChainLink, CertificateSan, db
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns the list can be ordered by, a leading '-' sorts descending
+SORT_COLUMNS = ('id', 'url', 'status', 'issuer', 'valid_until', 'last_checked', 'created_at')
+
+
+class QueryError(ValueError):
+    """Raised for invalid list parameters, reported to the client as a 400."""
+
+
+def parse_fields(value):
+    """Parse the ``fields=`` projection, always including the id."""
+    if not value:
+        return list(Certificate.FIELDS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in Certificate.FIELDS]
+    if unknown:
+        raise QueryError(f'Unknown fields: {", ".join(unknown)}')
+    return ['id'] + [field for field in fields if field != 'id']
+
+
+def parse_sort(value):
+    """Return the sort column and direction for the ``sort=`` parameter."""
+    value = value or 'id'
+    descending = value.startswith('-')
+    name = value.lstrip('-')
+    if name not in SORT_COLUMNS:
+        raise QueryError(f'Invalid sort column: {name}')
+    return getattr(Certificate, name), descending
+
+
+def parse_limit(value):
+    try:
+        limit = int(value) if value else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise QueryError('limit must be an integer')
+    if limit < 1:
+        raise QueryError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(value, cert_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, cert_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor, column):
+    try:
+        value, cert_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if value is not None and isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        return value, int(cert_id)
+    except (ValueError, TypeError):
+        raise QueryError('Invalid cursor')
+
+
+def apply_filters(query, args, now=None):
+    """Apply the filters shared by the list views.
+
+    ``url`` and ``subject`` match a prefix and ``serial_number`` the exact
+    value. ``chain`` selects certificates whose presented chain contains the
+    certificate with that SHA-256 fingerprint, for example an intermediate,
+    and ``san`` those valid for a name.
+    """
+    now = now or datetime.utcnow()
+    url = args.get('url')
+    if url:
+        query = query.filter(Certificate.url.startswith(url.strip(), autoescape=True))
+
+    subject = args.get('subject')
+    if subject:
+        query = query.filter(Certificate.subject.startswith(subject.strip(), autoescape=True))
+
+    serial_number = args.get('serial_number')
+    if serial_number:
+        query = query.filter(Certificate.serial_number == serial_number.strip())
+
+    status = args.get('status')
+    if status:
+        query = query.filter(Certificate.status == status)
+
+    error_class = args.get('error_class')
+    if error_class:
+        query = query.filter(Certificate.error_class == error_class)
+
+    issuer = args.get('issuer')
+    if issuer:
+        query = query.filter(Certificate.issuer == issuer)
+
+    chain = args.get('chain')
+    if chain:
+        query = query.filter(Certificate.id.in_(
+            db.select(CertificateChainLink.certificate_id)
+            .where(CertificateChainLink.fingerprint == chain.strip().lower())
+        ))
+
+    san = args.get('san')
+    if san:
+        query = query.filter(Certificate.id.in_(
+            db.select(CertificateSan.certificate_id).where(CertificateSan.name == san.strip().lower())
+        ))
+
+    expiring_within = args.get('expiring_within')
+    if expiring_within:
+        try:
+            days = int(expiring_within)
+        except ValueError:
+            raise QueryError('expiring_within must be a number of days')
+        query = query.filter(Certificate.valid_until >= now,
+                             Certificate.valid_until <= now + timedelta(days=days))
+    return query
+
+
+def after_cursor(column, descending, value, cert_id):
+    """Keyset condition selecting rows that sort after ``(value, cert_id)``.
+
+    NULLs sort last in both directions, ties are broken on the id.
+    """
+    id_after = Certificate.id < cert_id if descending else Certificate.id > cert_id
+    if column.key == 'id':
+        return id_after
+    if value is None:
+        return and_(column.is_(None), id_after)
+    value_after = column < value if descending else column > value
+    return or_(value_after, and_(column == value, id_after), column.is_(None))
+
+
+def list_page(args):
+    """Return one page of serialized certificates and the cursor of the next page."""
+    fields = parse_fields(args.get('fields'))
+    column, descending = parse_sort(args.get('sort'))
+    limit = parse_limit(args.get('limit'))
+
+    columns = Certificate.columns_for(fields)
+    if column.key not in {c.key for c in columns}:
+        columns.append(column)
+    query = apply_filters(db.session.query(*columns), args)
+
+    cursor = args.get('cursor')
+    if cursor:
+        query = query.filter(after_cursor(column, descending, *decode_cursor(cursor, column)))
+
+    if descending:
+        order = [column.desc().nullslast(), Certificate.id.desc()]
+    else:
+        order = [column.asc().nullslast(), Certificate.id.asc()]
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+
+    now = datetime.utcnow()
+    return [Certificate.serialize(row, fields, now) for row in rows], next_cursor
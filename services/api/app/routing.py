@@ -0,0 +1,5 @@
+# Celery queues served by the high, default and low priority worker pools
+QUEUE_HIGH = 'high_priority'
+QUEUE_DEFAULT = 'default'
+QUEUE_LOW = 'low_priority'
+QUEUES = (QUEUE_HIGH, QUEUE_DEFAULT, QUEUE_LOW)
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from .models import Certificate, CertificateSummary, db
+from .queries import QueryError
+from .store import redis_client
+
+# Schedule settings read live by the worker's dispatcher, see worker app/settings.py
+SETTINGS_KEY = 'certmon:settings'
+
+# Used until a setting has been changed through PUT /settings
+DEFAULT_SETTINGS = {
+    'check_interval_hours': int(os.getenv('SCHEDULE_MAX_INTERVAL_HOURS', '72')),
+    'sweep_rate': int(os.getenv('SWEEP_RATE', '0')),
+}
+
+# Accepted range of each setting
+SETTING_LIMITS = {
+    'check_interval_hours': (1, 168),
+    'sweep_rate': (0, 100000),
+}
+
+
+def get_settings():
+    settings = dict(DEFAULT_SETTINGS)
+    for name, value in redis_client.hgetall(SETTINGS_KEY).items():
+        name = name.decode()
+        if name in settings:
+            settings[name] = int(value)
+    return settings
+
+
+def parse_settings(data):
+    """Validate the settings in a request body and return them as integers."""
+    unknown = [name for name in data if name not in SETTING_LIMITS]
+    if unknown:
+        raise QueryError(f'Unknown settings: {", ".join(unknown)}')
+    settings = {}
+    for name, value in data.items():
+        low, high = SETTING_LIMITS[name]
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise QueryError(f'{name} must be an integer from {low} to {high}')
+        settings[name] = value
+    return settings
+
+
+def save_settings(settings):
+    if settings:
+        redis_client.hset(SETTINGS_KEY, mapping=settings)
+
+
+def spread_next_checks(interval_hours, now=None):
+    """Move checks scheduled beyond a shortened interval to random times within it.
+
+    Otherwise they would keep their old, later check time, and rescheduling
+    them all to now would cause exactly the burst the pacing avoids.
+    Returns the number of certificates moved.
+    """
+    now = now or datetime.utcnow()
+    interval = timedelta(hours=interval_hours)
+    result = db.session.execute(
+        update(Certificate)
+        .where(Certificate.next_check_at > now + interval)
+        .values(next_check_at=now + db.func.random() * interval)
+    )
+    return result.rowcount
+
+
+def required_sweep_rate(settings):
+    """Checks per minute needed to look at every certificate once per check interval."""
+    total = db.session.query(db.func.coalesce(db.func.sum(CertificateSummary.count), 0)).scalar()
+    return round(int(total) / (settings['check_interval_hours'] * 60), 1)
@@ -0,0 +1,29 @@
+import os
+import time
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Shared Redis client, connections are opened lazily from a per-process pool
+redis_client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://redis:6379/0'))
+
+# Uploaded import files are kept until the worker has processed them
+IMPORT_UPLOAD_KEY = 'certmon:import:{}'
+IMPORT_UPLOAD_TTL = 24 * 3600
+
+# Bumped after every write that changes what the API serves, see app.caching
+GENERATION_KEY = 'certmon:generation'
+GENERATION_AT_KEY = 'certmon:generation:at'
+
+
+def bump_generation():
+    """Invalidate cached responses after certificates changed."""
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.incr(GENERATION_KEY)
+            pipe.set(GENERATION_AT_KEY, int(time.time()))
+            pipe.execute()
+    except Exception as e:
+        # Cached responses then expire on their own
+        logger.error(f"Error bumping the certificate generation: {str(e)}")
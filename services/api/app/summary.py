@@ -0,0 +1,81 @@
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert
+from .models import CertificateSummary, db
+
+# Expiry windows reported by the summary, in days
+SUMMARY_EXPIRY_WINDOWS = (7, 30, 90)
+# Issuers listed in the summary, by number of certificates
+SUMMARY_TOP_ISSUERS = int(os.getenv('SUMMARY_TOP_ISSUERS', '20'))
+
+# Stands in for a missing expiry date, the summary's key columns cannot be NULL
+NO_EXPIRY = date.max
+
+
+def summary_key(status, issuer, valid_until):
+    """Return the ``(status, issuer, expires_on)`` aggregate a certificate is counted in."""
+    return status or '', issuer or '', valid_until.date() if valid_until else NO_EXPIRY
+
+
+def apply_summary_deltas(deltas):
+    """Add ``{key: delta}`` to the summary counts within the current session transaction."""
+    rows = [
+        {'status': status, 'issuer': issuer, 'expires_on': expires_on, 'count': delta}
+        for (status, issuer, expires_on), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    table = CertificateSummary.__table__
+    stmt = insert(table).values(rows)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['status', 'issuer', 'expires_on'],
+        set_={'count': table.c.count + stmt.excluded.count}
+    ))
+
+
+def count_certificates(certificates, delta):
+    """Add ``delta`` to the summary counts of each certificate, +1 when created and -1 when deleted."""
+    deltas = Counter()
+    for cert in certificates:
+        deltas[summary_key(cert.status, cert.issuer, cert.valid_until)] += delta
+    apply_summary_deltas(deltas)
+
+
+def get_summary(now=None):
+    """Return the dashboard counts from the summary table, independent of the inventory size."""
+    today = (now or datetime.utcnow()).date()
+    total = db.func.sum(CertificateSummary.count)
+
+    by_status = {
+        status: int(count)
+        for status, count in db.session.query(CertificateSummary.status, total)
+        .group_by(CertificateSummary.status)
+        .having(total != 0)
+    }
+
+    by_issuer = [
+        {'issuer': issuer, 'count': int(count)}
+        for issuer, count in db.session.query(CertificateSummary.issuer, total)
+        .filter(CertificateSummary.issuer != '')
+        .group_by(CertificateSummary.issuer)
+        .having(total != 0)
+        .order_by(total.desc(), CertificateSummary.issuer)
+        .limit(SUMMARY_TOP_ISSUERS)
+    ]
+
+    # Valid certificates expiring within each window, counted per day so the buckets stay current
+    expiring = db.session.query(*[
+        db.func.coalesce(db.func.sum(CertificateSummary.count).filter(
+            CertificateSummary.expires_on <= today + timedelta(days=days)
+        ), 0)
+        for days in SUMMARY_EXPIRY_WINDOWS
+    ]).filter(CertificateSummary.status == 'valid', CertificateSummary.expires_on >= today).one()
+
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'by_issuer': by_issuer,
+        'expiring': {str(days): int(count) for days, count in zip(SUMMARY_EXPIRY_WINDOWS, expiring)},
+        'generated_at': datetime.utcnow().isoformat()
+    }
@@ -1,14 +1,22 @@
 from celery import Celery
 import os
+from .leases import acquire_check_leases, acquire_priority_lease
+from .routing import QUEUE_HIGH, QUEUE_DEFAULT
+
+# Number of certificate IDs handed to each check_certificates task
+CHECK_BATCH_SIZE = int(os.getenv('SWEEP_CHUNK_SIZE', '500'))
 
 celery = Celery('app',
                 broker=os.getenv('REDIS_URL', 'redis://redis:6379/0'),
                 backend=os.getenv('REDIS_URL', 'redis://redis:6379/0'))
 
 celery.conf.update(
-    task_default_queue='celery',
+    task_default_queue=QUEUE_DEFAULT,
     task_routes={
-        'app.tasks.check_certificate': {'queue': 'celery'}
+        # Checks requested by a user jump ahead of the scheduled sweep
+        'app.tasks.check_certificate': {'queue': QUEUE_HIGH},
+        'app.tasks.check_certificates': {'queue': QUEUE_DEFAULT},
+        'app.tasks.process_import': {'queue': QUEUE_DEFAULT}
     },
     task_serializer='json',
     accept_content=['json'],
@@ -23,3 +31,43 @@ def check_certificate(cert_id):
     The actual implementation is in the worker service.
     """
     return {'cert_id': cert_id}
+
+@celery.task(name='app.tasks.check_certificates')
+def check_certificates(cert_ids):
+    """
+    Placeholder for the batch check task implemented in the worker service.
+    """
+    return {'cert_ids': cert_ids}
+
+@celery.task(name='app.tasks.process_import')
+def process_import(job_id):
+    """
+    Placeholder for the import task implemented in the worker service.
+    """
+    return {'job_id': job_id}
+
+def schedule_check(cert_id):
+    """Queue a high priority check for one certificate unless one is already queued or running.
+
+    A check queued by a sweep does not count, it could be far back in a
+    lower priority queue. Returns True if a new check was queued.
+    """
+    if not acquire_priority_lease(cert_id):
+        return False
+    check_certificate.apply_async(args=[cert_id], task_id=f'check_certificate_{cert_id}', queue=QUEUE_HIGH)
+    return True
+
+def publish_checks(cert_ids, queue=QUEUE_DEFAULT, batch_size=CHECK_BATCH_SIZE):
+    """Queue checks for ``cert_ids`` as batch tasks on ``queue`` over a single broker connection.
+
+    Certificates that already have a check queued or running are skipped,
+    the number of certificates queued is returned.
+    """
+    cert_ids = acquire_check_leases(cert_ids, queue)
+    if not cert_ids:
+        return 0
+    with celery.producer_or_acquire() as producer:
+        for start in range(0, len(cert_ids), batch_size):
+            check_certificates.apply_async(args=[cert_ids[start:start + batch_size]], queue=queue,
+                                           producer=producer)
+    return len(cert_ids)
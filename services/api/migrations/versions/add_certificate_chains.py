@@ -0,0 +1,58 @@
+"""add certificate fingerprints, chains and subject alternative names
+
+Revision ID: add_certificate_chains
+Revises: add_error_classification
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_certificate_chains'
+down_revision = 'add_error_classification'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('certificates', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index('ix_certificates_fingerprint', 'certificates', ['fingerprint'])
+
+    op.create_table('chain_certificates',
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=True),
+        sa.Column('issuer', sa.String(length=255), nullable=True),
+        sa.Column('serial_number', sa.String(length=255), nullable=True),
+        sa.Column('valid_from', sa.DateTime(), nullable=True),
+        sa.Column('valid_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('fingerprint')
+    )
+    op.create_table('certificate_chain_links',
+        sa.Column('certificate_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['certificate_id'], ['certificates.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['fingerprint'], ['chain_certificates.fingerprint']),
+        sa.PrimaryKeyConstraint('certificate_id', 'position')
+    )
+    op.create_index('ix_certificate_chain_links_fingerprint', 'certificate_chain_links', ['fingerprint'])
+    op.create_table('certificate_sans',
+        sa.Column('certificate_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['certificate_id'], ['certificates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('certificate_id', 'name')
+    )
+    op.create_index('ix_certificate_sans_name', 'certificate_sans', ['name'])
+
+
+def downgrade():
+    op.drop_index('ix_certificate_sans_name', table_name='certificate_sans')
+    op.drop_table('certificate_sans')
+    op.drop_index('ix_certificate_chain_links_fingerprint', table_name='certificate_chain_links')
+    op.drop_table('certificate_chain_links')
+    op.drop_table('chain_certificates')
+    op.drop_index('ix_certificates_fingerprint', table_name='certificates')
+    op.drop_column('certificates', 'fingerprint')
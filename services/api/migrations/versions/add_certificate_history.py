@@ -0,0 +1,57 @@
+"""add monthly partitioned certificate history
+
+Revision ID: add_certificate_history
+Revises: add_certificate_chains
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_certificate_history'
+down_revision = 'add_certificate_chains'
+branch_labels = None
+depends_on = None
+
+# Partitions created up front, the worker's maintain_history task keeps creating them
+INITIAL_PARTITIONS = 3
+
+
+def month_start(moment, offset=0):
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def upgrade():
+    op.create_table('certificate_history',
+        sa.Column('certificate_id', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('error_class', sa.String(length=32), nullable=True),
+        sa.Column('serial_number', sa.String(length=255), nullable=True),
+        sa.Column('issuer', sa.String(length=255), nullable=True),
+        sa.Column('valid_until', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['certificate_id'], ['certificates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('certificate_id', 'started_at'),
+        postgresql_partition_by='RANGE (started_at)'
+    )
+    now = datetime.utcnow()
+    for offset in range(INITIAL_PARTITIONS):
+        start, end = month_start(now, offset), month_start(now, offset + 1)
+        op.execute(f"CREATE TABLE certificate_history_{start.year:04d}_{start.month:02d} "
+                   f"PARTITION OF certificate_history FOR VALUES FROM ('{start.isoformat()}') "
+                   f"TO ('{end.isoformat()}')")
+    # Seed a run for every certificate that was already checked
+    op.execute("INSERT INTO certificate_history "
+               "(certificate_id, started_at, fingerprint, status, error_class, serial_number, issuer, valid_until) "
+               "SELECT id, now() AT TIME ZONE 'utc', fingerprint, status, error_class, serial_number, issuer, valid_until "
+               "FROM certificates WHERE last_checked IS NOT NULL")
+
+
+def downgrade():
+    # Dropping the parent drops every partition
+    op.drop_table('certificate_history')
@@ -0,0 +1,33 @@
+"""add certificate summary counts
+
+Revision ID: add_certificate_summary
+Revises: add_certificate_history
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_certificate_summary'
+down_revision = 'add_certificate_history'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('certificate_summary',
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('issuer', sa.String(length=255), nullable=False),
+        sa.Column('expires_on', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('status', 'issuer', 'expires_on')
+    )
+    op.execute("INSERT INTO certificate_summary (status, issuer, expires_on, count) "
+               "SELECT coalesce(status, ''), coalesce(issuer, ''), coalesce(date(valid_until), '9999-12-31'), "
+               "count(*) FROM certificates GROUP BY 1, 2, 3")
+
+
+def downgrade():
+    op.drop_table('certificate_summary')
@@ -0,0 +1,29 @@
+"""add adaptive check scheduling columns
+
+Revision ID: add_check_scheduling
+Revises: add_serial_number
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_check_scheduling'
+down_revision = 'add_serial_number'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('certificates', sa.Column('error_count', sa.Integer(), nullable=False, server_default='0'))
+    # Existing certificates become due immediately and are rescheduled by their first check
+    op.add_column('certificates', sa.Column('next_check_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    op.create_index(op.f('ix_certificates_next_check_at'), 'certificates', ['next_check_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_certificates_next_check_at'), table_name='certificates')
+    op.drop_column('certificates', 'next_check_at')
+    op.drop_column('certificates', 'error_count')
@@ -0,0 +1,29 @@
+"""add error classification columns
+
+Revision ID: add_error_classification
+Revises: add_import_jobs
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_error_classification'
+down_revision = 'add_import_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('certificates', sa.Column('error_class', sa.String(length=32), nullable=True))
+    op.add_column('certificates', sa.Column('error_message', sa.String(length=255), nullable=True))
+    # Free-form 'error: ...' statuses from older checks become plain errors
+    op.execute("UPDATE certificates SET error_class = 'internal', error_message = status, status = 'error' "
+               "WHERE status LIKE 'error%'")
+
+
+def downgrade():
+    op.drop_column('certificates', 'error_message')
+    op.drop_column('certificates', 'error_class')
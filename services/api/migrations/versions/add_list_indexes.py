@@ -0,0 +1,27 @@
+"""add indexes for certificate list filters and keyset pagination
+
+Revision ID: add_list_indexes
+Revises: add_check_scheduling
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_list_indexes'
+down_revision = 'add_check_scheduling'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_certificates_status_id', 'certificates', ['status', 'id'], unique=False)
+    op.create_index('ix_certificates_issuer_id', 'certificates', ['issuer', 'id'], unique=False)
+    op.create_index('ix_certificates_valid_until_id', 'certificates', ['valid_until', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_certificates_valid_until_id', table_name='certificates')
+    op.drop_index('ix_certificates_issuer_id', table_name='certificates')
+    op.drop_index('ix_certificates_status_id', table_name='certificates')
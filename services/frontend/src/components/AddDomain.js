@@ -85,7 +85,7 @@ function AddDomain() {
         queryClient.invalidateQueries(['certificates']);
         setAlert({ 
           open: true, 
-          message: 'Domains imported successfully', 
+          message: 'Import started, domains will appear as they are processed', 
           severity: 'success' 
         });
       } catch (error) {
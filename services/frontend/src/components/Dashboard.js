@@ -7,6 +7,7 @@ import {
   InputLabel,
   MenuItem,
   Select,
+  TextField,
   TableHead,
   TableBody,
   TableRow,
@@ -28,7 +29,7 @@ import AddIcon from '@mui/icons-material/Add';
 import InfoIcon from '@mui/icons-material/Info';
 import RefreshIcon from '@mui/icons-material/Refresh';
 import DeleteIcon from '@mui/icons-material/Delete';
-import { useQuery, useQueryClient, useMutation } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery, useQueryClient, useMutation } from '@tanstack/react-query';
 import axios from 'axios';
 
 // Import shared components
@@ -39,6 +40,91 @@ import ResponsiveTable from './shared/ResponsiveTable';
 
 const API_URL = '/api';
 
+// Certificates loaded per page, further pages load on scroll
+const PAGE_SIZE = 100;
+
+// Certificates created between two updates that are fetched one by one, more reload the list
+const MAX_FETCHED_CREATED = 50;
+
+const emptyChanges = () => ({ changed: new Map(), created: new Set(), deleted: new Set(), reset: false });
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Naive UTC timestamps from the API
+const msUntil = (timestamp) => {
+  const utc = /(Z|[+-]\d\d:\d\d)$/i.test(timestamp) ? timestamp : `${timestamp}Z`;
+  return new Date(utc) - Date.now();
+};
+
+// Matches the days_remaining the API computes
+const daysUntil = (timestamp) => (timestamp ? Math.floor(msUntil(timestamp) / DAY_MS) : null);
+
+// List query parameters for the dashboard filters, the API does the filtering
+const listParams = (filters, expiryFilter) => {
+  const expiry = {
+    valid: { status: 'valid' },
+    expired: { status: 'expired' },
+    expiring30: { status: 'valid', expiring_within: 30 }
+  }[expiryFilter] || {};
+  const params = {
+    ...expiry,
+    url: filters.url.trim(),
+    subject: filters.commonName.trim(),
+    serial_number: filters.serialNumber.trim(),
+    issuer: filters.issuer,
+    ...(filters.status !== 'all' ? { status: filters.status } : {})
+  };
+  return Object.fromEntries(Object.entries(params).filter(([, value]) => value !== '' && value !== undefined));
+};
+
+// Whether a certificate belongs in a list loaded with ``params``, decided as the API does
+const matchesParams = (cert, params) => {
+  if (params.url && !cert.url?.startsWith(params.url)) return false;
+  if (params.subject && !cert.subject?.startsWith(params.subject)) return false;
+  if (params.serial_number && cert.serial_number !== params.serial_number) return false;
+  if (params.issuer && cert.issuer !== params.issuer) return false;
+  if (params.status && cert.status !== params.status) return false;
+  if (params.expiring_within) {
+    const remaining = cert.valid_until ? msUntil(cert.valid_until) : -1;
+    if (remaining < 0 || remaining > params.expiring_within * DAY_MS) return false;
+  }
+  return true;
+};
+
+// Merge a changed event into a cached certificate row
+const applyChange = (cert, change) => ({
+  ...cert,
+  status: change.status,
+  error_class: change.error_class,
+  error_message: change.error_class ? cert.error_message : null,
+  fingerprint: change.fingerprint,
+  issuer: change.issuer,
+  valid_until: change.valid_until,
+  days_remaining: daysUntil(change.valid_until)
+});
+
+// Apply a batch of events to one cached list. Certificates that only start matching
+// its filters through a change appear with the next refetch.
+const applyChanges = (data, params, { changed, deleted }, added) => {
+  if (!data) return data;
+  const known = new Set(data.pages.flatMap((page) => page.items.map((cert) => cert.id)));
+  const pages = data.pages.map((page) => ({
+    ...page,
+    items: page.items
+      .filter((cert) => !deleted.has(cert.id))
+      .map((cert) => (changed.has(cert.id) ? applyChange(cert, changed.get(cert.id)) : cert))
+      .filter((cert) => matchesParams(cert, params))
+  }));
+  // New certificates sort last by id, they belong in the list once its last page is loaded
+  const last = pages[pages.length - 1];
+  if (last && !last.nextCursor) {
+    last.items = last.items.concat(
+      added.filter((cert) => !known.has(cert.id) && !deleted.has(cert.id) && matchesParams(cert, params))
+    );
+  }
+  return { ...data, pages };
+};
+
 const Dashboard = () => {
   const queryClient = useQueryClient();
   const [anchorEl, setAnchorEl] = useState(null);
@@ -54,18 +140,89 @@ const Dashboard = () => {
     serialNumber: '',
     status: 'all'
   });
+  // Filters as last sent to the API, typing is debounced
+  const [queryFilters, setQueryFilters] = useState(filters);
+  const loadMoreRef = React.useRef(null);
 
   // Configure axios defaults
   React.useEffect(() => {
     axios.defaults.baseURL = window.location.origin;
   }, []);
 
-  const { data: certificates = [], isLoading, error } = useQuery({
-    queryKey: ['certificates'],
-    queryFn: async () => {
+  useEffect(() => {
+    const timer = setTimeout(() => setQueryFilters(filters), 300);
+    return () => clearTimeout(timer);
+  }, [filters]);
+
+  // Apply the changes the API reports to the cached lists instead of reloading every page.
+  // EventSource reconnects on its own and resumes from the last event it saw.
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/certificates/events`);
+    let pending = emptyChanges();
+    let timer = null;
+
+    const apply = async () => {
+      timer = null;
+      const changes = pending;
+      const { created, reset } = changes;
+      pending = emptyChanges();
+      // Events were missed or too many certificates were added to fetch one by one
+      if (reset || created.size > MAX_FETCHED_CREATED) {
+        queryClient.invalidateQueries({ queryKey: ['certificates'] });
+        return;
+      }
+      // Created events carry no details, fetch just those certificates
+      const responses = await Promise.allSettled(
+        [...created].map((id) => axios.get(`${API_URL}/certificates/${id}`))
+      );
+      const added = responses.filter((r) => r.status === 'fulfilled').map((r) => r.value.data);
+      // One cached list per combination of filters, the parameters are the last part of its key
+      queryClient.getQueriesData({ queryKey: ['certificates', 'list'] }).forEach(([key, data]) => {
+        queryClient.setQueryData(key, applyChanges(data, key[2], changes, added));
+      });
+      // The counts are one small request, refetch them rather than recomputing
+      queryClient.invalidateQueries({ queryKey: ['certificates', 'summary'], exact: true });
+    };
+
+    const handle = (event) => {
+      const data = JSON.parse(event.data || '{}');
+      if (event.type === 'changed') {
+        pending.changed.set(data.id, data);
+      } else if (event.type === 'created') {
+        pending.created.add(data.id);
+      } else if (event.type === 'deleted') {
+        pending.deleted.add(data.id);
+        pending.created.delete(data.id);
+      } else {
+        pending.reset = true;
+      }
+      // Collapse bursts of changes from one batch of checks into a single update
+      if (!timer) timer = setTimeout(apply, 2000);
+    };
+    ['changed', 'created', 'deleted', 'reset'].forEach((type) => source.addEventListener(type, handle));
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, [queryClient]);
+
+  const params = React.useMemo(() => listParams(queryFilters, expiryFilter), [queryFilters, expiryFilter]);
+
+  const {
+    data,
+    isLoading,
+    error,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery({
+    queryKey: ['certificates', 'list', params],
+    queryFn: async ({ pageParam }) => {
       try {
-        const response = await axios.get(`${API_URL}/certificates`);
-        return response.data;
+        const response = await axios.get(`${API_URL}/certificates`, {
+          params: { ...params, limit: PAGE_SIZE, ...(pageParam ? { cursor: pageParam } : {}) }
+        });
+        return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
       } catch (error) {
         console.error('API Error:', error);
         setAlert({
@@ -76,10 +233,25 @@ const Dashboard = () => {
         throw error;
       }
     },
-    refetchInterval: 5 * 60 * 1000, // 5 minutes frontend refresh
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
+    refetchInterval: 15 * 60 * 1000, // Fallback, changes arrive as events
     retry: 3
   });
 
+  const certificates = React.useMemo(() => data?.pages.flatMap((page) => page.items) ?? [], [data]);
+
+  // Load the next page when the end of the table scrolls into view
+  useEffect(() => {
+    const node = loadMoreRef.current;
+    if (!node || !hasNextPage) return undefined;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting && !isFetchingNextPage) fetchNextPage();
+    });
+    observer.observe(node);
+    return () => observer.disconnect();
+  }, [hasNextPage, isFetchingNextPage, fetchNextPage]);
+
   // Add a function to handle refresh interval change
   const handleRefreshIntervalChange = async (event) => {
     const newInterval = event.target.value;
@@ -100,72 +272,23 @@ const Dashboard = () => {
     }
   };
 
-  const certificateStats = React.useMemo(() => {
-    const now = new Date();
-    return {
-      total: certificates.length,
-      valid: certificates.filter(cert => cert.status === 'valid').length,
-      expired: certificates.filter(cert => cert.status === 'expired').length,
-      expiring: certificates.filter(cert => {
-        if (!cert.valid_until || cert.status !== 'valid') return false;
-        const expiryDate = new Date(cert.valid_until);
-        const daysUntilExpiry = Math.ceil((expiryDate - now) / (1000 * 60 * 60 * 24));
-        return daysUntilExpiry <= 30;
-      }).length,
-    };
-  }, [certificates]);
-
-  const filteredCertificates = React.useMemo(() => {
-    let filtered = certificates;
-    
-    // Apply text filters
-    if (filters.url) {
-      filtered = filtered.filter(cert => 
-        cert.url.toLowerCase().includes(filters.url.toLowerCase())
-      );
-    }
-    if (filters.commonName) {
-      filtered = filtered.filter(cert => 
-        cert.subject?.toLowerCase().includes(filters.commonName.toLowerCase())
-      );
-    }
-    if (filters.issuer) {
-      filtered = filtered.filter(cert => 
-        cert.issuer?.toLowerCase().includes(filters.issuer.toLowerCase())
-      );
-    }
-    if (filters.serialNumber) {
-      filtered = filtered.filter(cert => 
-        cert.serial_number?.toLowerCase().includes(filters.serialNumber.toLowerCase())
-      );
-    }
-    if (filters.status !== 'all') {
-      filtered = filtered.filter(cert => cert.status === filters.status);
-    }
+  // Counts come precomputed from the API instead of being derived from every row
+  const { data: summary } = useQuery({
+    queryKey: ['certificates', 'summary'],
+    queryFn: async () => {
+      const response = await axios.get(`${API_URL}/certificates/summary`);
+      return response.data;
+    },
+    refetchInterval: 15 * 60 * 1000,
+    retry: 3
+  });
 
-    // Apply expiry filter
-    const now = new Date();
-    switch (expiryFilter) {
-      case 'expiring30':
-        filtered = filtered.filter(cert => {
-          if (!cert.valid_until || cert.status !== 'valid') return false;
-          const expiryDate = new Date(cert.valid_until);
-          const daysUntilExpiry = Math.ceil((expiryDate - now) / (1000 * 60 * 60 * 24));
-          return daysUntilExpiry <= 30;
-        });
-        break;
-      case 'expired':
-        filtered = filtered.filter(cert => cert.status === 'expired');
-        break;
-      case 'valid':
-        filtered = filtered.filter(cert => cert.status === 'valid');
-        break;
-      default:
-        break;
-    }
-    
-    return filtered;
-  }, [certificates, filters, expiryFilter]);
+  const certificateStats = {
+    total: summary?.total ?? 0,
+    valid: summary?.by_status?.valid ?? 0,
+    expired: summary?.by_status?.expired ?? 0,
+    expiring: summary?.expiring?.['30'] ?? 0,
+  };
 
   const deleteCertMutation = useMutation({
     mutationFn: async (id) => {
@@ -279,34 +402,22 @@ const Dashboard = () => {
         <FilterContainer title="Filters">
           <Grid container spacing={{ xs: 1, sm: 2 }}>
             <Grid item xs={12} sm={6} md={2}>
-              <FormControl fullWidth size="small">
-                <InputLabel>URL</InputLabel>
-                <Select
-                  value={filters.url}
-                  label="URL"
-                  onChange={(e) => setFilters({ ...filters, url: e.target.value })}
-                >
-                  <MenuItem value="">All</MenuItem>
-                  {certificates.map((cert) => (
-                    <MenuItem key={cert.id} value={cert.url}>{cert.url}</MenuItem>
-                  ))}
-                </Select>
-              </FormControl>
+              <TextField
+                fullWidth
+                size="small"
+                label="URL"
+                value={filters.url}
+                onChange={(e) => setFilters({ ...filters, url: e.target.value })}
+              />
             </Grid>
             <Grid item xs={12} sm={6} md={2}>
-              <FormControl fullWidth size="small">
-                <InputLabel>Common Name</InputLabel>
-                <Select
-                  value={filters.commonName}
-                  label="Common Name"
-                  onChange={(e) => setFilters({ ...filters, commonName: e.target.value })}
-                >
-                  <MenuItem value="">All</MenuItem>
-                  {certificates.map((cert) => (
-                    <MenuItem key={cert.id} value={cert.subject}>{cert.subject}</MenuItem>
-                  ))}
-                </Select>
-              </FormControl>
+              <TextField
+                fullWidth
+                size="small"
+                label="Common Name"
+                value={filters.commonName}
+                onChange={(e) => setFilters({ ...filters, commonName: e.target.value })}
+              />
             </Grid>
             <Grid item xs={12} sm={6} md={2}>
               <FormControl fullWidth size="small">
@@ -317,26 +428,20 @@ const Dashboard = () => {
                   onChange={(e) => setFilters({ ...filters, issuer: e.target.value })}
                 >
                   <MenuItem value="">All</MenuItem>
-                  {certificates.map((cert) => (
-                    <MenuItem key={cert.id} value={cert.issuer}>{cert.issuer}</MenuItem>
+                  {(summary?.by_issuer ?? []).map(({ issuer }) => (
+                    <MenuItem key={issuer} value={issuer}>{issuer}</MenuItem>
                   ))}
                 </Select>
               </FormControl>
             </Grid>
             <Grid item xs={12} sm={6} md={2}>
-              <FormControl fullWidth size="small">
-                <InputLabel>Serial Number</InputLabel>
-                <Select
-                  value={filters.serialNumber}
-                  label="Serial Number"
-                  onChange={(e) => setFilters({ ...filters, serialNumber: e.target.value })}
-                >
-                  <MenuItem value="">All</MenuItem>
-                  {certificates.map((cert) => (
-                    <MenuItem key={cert.id} value={cert.serial_number}>{cert.serial_number}</MenuItem>
-                  ))}
-                </Select>
-              </FormControl>
+              <TextField
+                fullWidth
+                size="small"
+                label="Serial Number"
+                value={filters.serialNumber}
+                onChange={(e) => setFilters({ ...filters, serialNumber: e.target.value })}
+              />
             </Grid>
             <Grid item xs={12} sm={6} md={2}>
               <FormControl fullWidth size="small">
@@ -388,7 +493,7 @@ const Dashboard = () => {
             </TableRow>
           </TableHead>
           <TableBody>
-            {filteredCertificates.map((cert) => (
+            {certificates.map((cert) => (
               <TableRow key={cert.id} hover>
                 <TableCell sx={{ maxWidth: { xs: 150, sm: 200 }, overflow: 'hidden', textOverflow: 'ellipsis' }}>
                   {cert.url}
@@ -457,7 +562,16 @@ const Dashboard = () => {
                 </TableCell>
               </TableRow>
             ))}
-            {filteredCertificates.length === 0 && (
+            {hasNextPage && (
+              <TableRow ref={loadMoreRef}>
+                <TableCell colSpan={10} align="center">
+                  <Button onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                    {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                  </Button>
+                </TableCell>
+              </TableRow>
+            )}
+            {certificates.length === 0 && (
               <TableRow>
                 <TableCell colSpan={10} align="center" sx={{ py: { xs: 2, sm: 3 }, fontSize: { xs: '0.875rem', sm: '1rem' } }}>
                   <Typography variant="body1" color="text.secondary" sx={{ fontSize: 'inherit' }}>
@@ -1,5 +1,8 @@
 from celery import Celery
+from kombu import Queue
 import os
+from .routing import QUEUES, QUEUE_DEFAULT
+from .scheduler import DISPATCH_INTERVAL
 
 app = Celery('app',
             broker=os.getenv('REDIS_URL', 'redis://redis:6379/0'),
@@ -7,19 +10,34 @@ app = Celery('app',
             include=['app.tasks'])
 
 app.conf.update(
-    task_default_queue='celery',
+    # Checks are routed per call to a priority queue, see app.routing
+    task_default_queue=QUEUE_DEFAULT,
+    task_queues=[Queue(name) for name in QUEUES],
     task_routes={
-        'app.tasks.check_certificate': {'queue': 'celery'},
-        'app.tasks.check_all_certificates': {'queue': 'celery'}
+        'app.tasks.check_all_certificates': {'queue': QUEUE_DEFAULT},
+        'app.tasks.dispatch_due_certificates': {'queue': QUEUE_DEFAULT},
+        'app.tasks.maintain_history': {'queue': QUEUE_DEFAULT},
+        'app.tasks.reconcile_summary': {'queue': QUEUE_DEFAULT},
+        'app.tasks.process_import': {'queue': QUEUE_DEFAULT}
     },
     task_serializer='json',
     accept_content=['json'],
     result_serializer='json',
     enable_utc=True,
     beat_schedule={
-        'check-certificates-every-16-hours': {
-            'task': 'app.tasks.check_all_certificates',
-            'schedule': 16 * 3600,  # 16 hours in seconds
+        # Each certificate carries its own next_check_at, the beat only drains the due queue
+        'dispatch-due-certificates': {
+            'task': 'app.tasks.dispatch_due_certificates',
+            'schedule': DISPATCH_INTERVAL,  # seconds
+        },
+        'maintain-history': {
+            'task': 'app.tasks.maintain_history',
+            'schedule': 24 * 3600,
+        },
+        # The summary is kept up to date incrementally, this only corrects drift
+        'reconcile-summary': {
+            'task': 'app.tasks.reconcile_summary',
+            'schedule': int(os.getenv('SUMMARY_RECONCILE_INTERVAL', '3600')),  # seconds
         },
     }
 )
@@ -0,0 +1,58 @@
+import os
+import json
+import logging
+from datetime import datetime
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Seconds a probe result is reused for other certificates on the same endpoint
+PROBE_CACHE_TTL = int(os.getenv('PROBE_CACHE_TTL', '300'))
+
+CACHE_KEY = 'certmon:probe:{}'
+DATETIME_FIELDS = ('valid_from', 'valid_until')
+
+
+def _encode(cert_info):
+    return json.dumps(cert_info, default=lambda value: value.isoformat())
+
+
+def _decode_dates(info):
+    for name in DATETIME_FIELDS:
+        if info.get(name):
+            info[name] = datetime.fromisoformat(info[name])
+    return info
+
+
+def _decode(payload):
+    cert_info = _decode_dates(json.loads(payload))
+    for entry in cert_info.get('chain') or []:
+        _decode_dates(entry)
+    return cert_info
+
+
+def get_cached_results(targets):
+    """Return ``{target: cert_info}`` for every target with a live cached probe result."""
+    targets = list(targets)
+    if not targets or PROBE_CACHE_TTL <= 0:
+        return {}
+    try:
+        payloads = redis_client.mget([CACHE_KEY.format(target) for target in targets])
+    except Exception as e:
+        # The cache is an optimisation, fall back to probing
+        logger.error(f"Error reading probe cache: {str(e)}")
+        return {}
+    return {target: _decode(payload) for target, payload in zip(targets, payloads) if payload}
+
+
+def cache_results(results):
+    """Store ``{target: cert_info}`` probe results for ``PROBE_CACHE_TTL`` seconds in one round trip."""
+    if not results or PROBE_CACHE_TTL <= 0:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for target, cert_info in results.items():
+                pipe.set(CACHE_KEY.format(target), _encode(cert_info), ex=PROBE_CACHE_TTL)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error writing probe cache: {str(e)}")
@@ -1,5 +1,4 @@
+# Kept so that ``celery -A app.celery`` keeps resolving to the worker application
 from . import app
-from . import tasks
 
-# This is required to ensure the tasks are registered
-app.autodiscover_tasks(['app.tasks'])
+__all__ = ['app']
@@ -0,0 +1,108 @@
+import os
+import time
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+from .metrics import DB_POOL_WAIT_SECONDS, DB_POOL_TIMEOUTS, DB_CONNECTION_HELD_SECONDS, DB_CONNECTIONS
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+# Connections kept open per worker process, each prefork child runs one task at a time
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '2'))
+# Extra connections opened under load and closed again when returned
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '2'))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Connections older than this are replaced, keep it under any server or proxy idle timeout
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Behind PgBouncer in transaction mode, PgBouncer pools and the worker keeps no idle connections
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+
+# Engine of the current process, see get_engine
+engine = None
+_engine_pid = None
+# Bound per call, Session(bind=get_engine())
+Session = sessionmaker()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def engine_options():
+    if DB_PGBOUNCER:
+        return {'poolclass': NullPool}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+def get_engine():
+    """Return the engine of the current process, creating it on first use.
+
+    Connections must never cross a fork, so a process that inherited its
+    parent's engine builds its own.
+    """
+    global engine, _engine_pid
+    if engine is None or _engine_pid != os.getpid():
+        engine = create_engine(DATABASE_URL, **engine_options())
+        _engine_pid = os.getpid()
+    return engine
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Give each prefork child its own engine, dropping any inherited from the parent without closing it."""
+    global engine
+    if engine is not None:
+        # close=False leaves the parent's sockets alone
+        engine.dispose(close=False)
+        engine = None
+    get_engine()
+
+
+@worker_process_shutdown.connect
+def dispose_engine(**kwargs):
+    if engine is not None and _engine_pid == os.getpid():
+        engine.dispose()
+
+
+@event.listens_for(Pool, 'connect')
+def count_connect(dbapi_connection, connection_record):
+    DB_CONNECTIONS.labels('open').inc()
+
+
+@event.listens_for(Pool, 'close')
+def count_close(dbapi_connection, connection_record):
+    DB_CONNECTIONS.labels('open').dec()
+
+
+@event.listens_for(Pool, 'checkout')
+def start_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+    DB_CONNECTIONS.labels('checked_out').inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def end_checkout(dbapi_connection, connection_record):
+    started = connection_record.info.pop('checked_out_at', None)
+    if started is not None:
+        DB_CONNECTIONS.labels('checked_out').dec()
+        DB_CONNECTION_HELD_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,40 @@
+import os
+import json
+import logging
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients resuming with Last-Event-ID, trimmed approximately
+EVENTS_MAX_LEN = int(os.getenv('EVENTS_MAX_LEN', '10000'))
+
+# Redis stream read by the API's GET /certificates/events
+EVENTS_STREAM_KEY = 'certmon:events'
+
+
+def change_event(cert_id, cert_info):
+    """Build the event announcing a certificate's new status or fingerprint."""
+    valid_until = cert_info.get('valid_until')
+    return {
+        'id': cert_id,
+        'status': cert_info.get('status'),
+        'error_class': cert_info.get('error_class'),
+        'fingerprint': cert_info.get('fingerprint'),
+        'issuer': cert_info.get('issuer'),
+        'valid_until': valid_until.isoformat() if valid_until else None,
+    }
+
+
+def publish_events(event_type, events):
+    """Append events to the stream after the change they describe was committed."""
+    if not events:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(EVENTS_STREAM_KEY, {'type': event_type, 'data': json.dumps(event)},
+                          maxlen=EVENTS_MAX_LEN, approximate=True)
+            pipe.execute()
+    except Exception as e:
+        # Clients still see the change on their next fetch
+        logger.error(f"Error publishing {len(events)} certificate events: {str(e)}")
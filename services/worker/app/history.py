@@ -0,0 +1,79 @@
+import os
+import re
+import logging
+from datetime import datetime
+from sqlalchemy import text
+from .models import CertificateHistory
+
+logger = logging.getLogger(__name__)
+
+# Months of history kept, older monthly partitions are dropped whole
+HISTORY_RETENTION_MONTHS = int(os.getenv('HISTORY_RETENTION_MONTHS', '12'))
+# Partitions created ahead of time so inserts never run out of a partition
+HISTORY_PARTITIONS_AHEAD = int(os.getenv('HISTORY_PARTITIONS_AHEAD', '2'))
+
+# Columns copied from a check result into a history row
+HISTORY_FIELDS = ('fingerprint', 'status', 'error_class', 'serial_number', 'issuer', 'valid_until')
+
+PARTITION_NAME = re.compile(r'^certificate_history_(\d{4})_(\d{2})$')
+
+
+def has_changed(cert, cert_info):
+    """Whether a check result starts a new history run for ``cert``.
+
+    A run lasts as long as the presented certificate and the outcome of the
+    check stay the same, so only rotations and status changes are written.
+    """
+    return (cert_info.get('fingerprint') != cert.fingerprint
+            or cert_info.get('status') != cert.status
+            or cert_info.get('error_class') != cert.error_class)
+
+
+def history_row(cert_id, cert_info, started_at):
+    row = {name: cert_info.get(name) for name in HISTORY_FIELDS}
+    row['certificate_id'] = cert_id
+    row['started_at'] = started_at
+    return row
+
+
+def month_start(moment, offset=0):
+    """Return the first day of the month ``offset`` months from ``moment``."""
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{CertificateHistory.__tablename__}_{month.year:04d}_{month.month:02d}'
+
+
+def ensure_partitions(conn, now=None, ahead=HISTORY_PARTITIONS_AHEAD):
+    """Create the monthly partitions from the current month to ``ahead`` months out."""
+    now = now or datetime.utcnow()
+    for offset in range(ahead + 1):
+        start = month_start(now, offset)
+        end = month_start(now, offset + 1)
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {partition_name(start)} '
+            f'PARTITION OF {CertificateHistory.__tablename__} '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+
+
+def drop_expired_partitions(conn, now=None, retention_months=HISTORY_RETENTION_MONTHS):
+    """Drop monthly partitions that ended before the retention window and return their names."""
+    cutoff = month_start(now or datetime.utcnow(), -retention_months)
+    partitions = conn.execute(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON pg_inherits.inhparent = parent.oid '
+        'JOIN pg_class child ON pg_inherits.inhrelid = child.oid '
+        'WHERE parent.relname = :parent'
+    ), {'parent': CertificateHistory.__tablename__}).scalars()
+
+    dropped = []
+    for name in partitions:
+        match = PARTITION_NAME.match(name)
+        if match and datetime(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+            # Dropping a partition is instant and leaves no dead rows to vacuum
+            conn.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+    return dropped
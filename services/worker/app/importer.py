@@ -0,0 +1,170 @@
+import csv
+import io
+import os
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from .models import Certificate, ImportJob
+from .summary import summary_key, apply_summary_deltas
+from .store import bump_generation
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per INSERT ... ON CONFLICT statement
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+# Bytes fetched from Redis per read of an uploaded file
+IMPORT_READ_SIZE = 64 * 1024
+# Cap on the number of error messages kept on the job
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded CSV is in neither supported format."""
+
+
+class RedisUpload(io.RawIOBase):
+    """Read-only file object over an upload stored in a Redis string, fetched in ranges."""
+
+    def __init__(self, client, key):
+        self.client = client
+        self.key = key
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.client.getrange(self.key, self.offset, self.offset + len(buffer) - 1)
+        buffer[:len(data)] = data
+        self.offset += len(data)
+        return len(data)
+
+
+def host_port_url(host, port):
+    """Build the certificate URL for a ``host,port`` row."""
+    host = host.strip()
+    port = port.strip() if port else ''
+    if not port or port == '443':
+        return f'https://{host}'
+    if not port.isdigit():
+        raise ValueError(f'Invalid port "{port}"')
+    return f'https://{host}:{port}'
+
+
+def iter_urls(stream):
+    """Yield ``(line, url, error)`` for every row of an uploaded CSV without loading it into memory.
+
+    Two layouts are accepted: a header row with a ``url`` column, or
+    ``host,port`` rows with an optional ``host,port`` header as used by
+    ``new_test_domains.csv``.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    first = next(reader, None)
+    if first is None:
+        return
+
+    header = [column.strip().lower() for column in first]
+    if 'url' in header:
+        index = header.index('url')
+        def to_url(row):
+            return row[index].strip()
+        rows = reader
+    elif header and header[0] == 'host':
+        def to_url(row):
+            return host_port_url(row[0], row[1] if len(row) > 1 else None)
+        rows = reader
+    elif len(first) == 2 and first[1].strip().isdigit():
+        # Headerless host,port rows, the first row is data
+        def to_url(row):
+            return host_port_url(row[0], row[1] if len(row) > 1 else None)
+        rows = _prepend(first, reader)
+    else:
+        raise ImportFormatError('CSV must contain a "url" column or host,port rows')
+
+    for row in rows:
+        if not any(field.strip() for field in row):
+            continue
+        try:
+            url = to_url(row)
+            if not url:
+                raise ValueError('empty URL')
+            if len(url) > 255:
+                raise ValueError('URL is longer than 255 characters')
+            yield reader.line_num, url, None
+        except (IndexError, ValueError) as e:
+            yield reader.line_num, None, str(e)
+
+
+def _prepend(row, rows):
+    yield row
+    yield from rows
+
+
+def insert_urls(conn, urls):
+    """Insert new certificates for ``urls`` in one statement and return the IDs that were created."""
+    now = datetime.utcnow()
+    table = Certificate.__table__
+    stmt = (
+        insert(table)
+        .values([
+            {'url': url, 'status': 'pending', 'created_at': now, 'updated_at': now, 'next_check_at': now}
+            for url in urls
+        ])
+        .on_conflict_do_nothing(index_elements=['url'])
+        .returning(table.c.id)
+    )
+    return list(conn.execute(stmt).scalars())
+
+
+def update_job(conn, job_id, **values):
+    table = ImportJob.__table__
+    conn.execute(update(table).where(table.c.id == job_id).values(updated_at=datetime.utcnow(), **values))
+
+
+def run_import(engine, job_id, stream, publish, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import certificates from a CSV stream chunk by chunk, recording progress on the import job.
+
+    ``publish`` is called with the IDs created by each chunk so their first
+    check can be queued.
+    """
+    counts = {'rows_parsed': 0, 'rows_added': 0, 'rows_skipped': 0, 'rows_errored': 0}
+    errors = []
+
+    def flush(urls):
+        # dict.fromkeys drops duplicates within the chunk but keeps order
+        unique = list(dict.fromkeys(urls))
+        with engine.begin() as conn:
+            ids = insert_urls(conn, unique)
+            apply_summary_deltas(conn, {summary_key('pending', None, None): len(ids)})
+            counts['rows_added'] += len(ids)
+            counts['rows_skipped'] += len(urls) - len(ids)
+            update_job(conn, job_id, errors=json.dumps(errors), **counts)
+        if ids:
+            bump_generation()
+        publish(ids)
+
+    with engine.begin() as conn:
+        update_job(conn, job_id, status='running', started_at=datetime.utcnow())
+
+    chunk = []
+    for line, url, error in iter_urls(stream):
+        counts['rows_parsed'] += 1
+        if error:
+            counts['rows_errored'] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f'Error on line {line}: {error}')
+            continue
+        chunk.append(url)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    with engine.begin() as conn:
+        update_job(conn, job_id, status='completed', finished_at=datetime.utcnow(),
+                   errors=json.dumps(errors), **counts)
+    logger.info(f"Import {job_id} added {counts['rows_added']} certificates, skipped {counts['rows_skipped']}")
+    return counts
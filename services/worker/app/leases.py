@@ -0,0 +1,84 @@
+import os
+import logging
+from .store import redis_client
+from .routing import QUEUE_DEFAULT
+
+logger = logging.getLogger(__name__)
+
+# A queued or running check holds its lease until it finishes or the lease expires
+CHECK_LEASE_TTL = int(os.getenv('CHECK_LEASE_TTL', '900'))
+# Checks per second the worker pools get through, to extend leases over the expected queue wait
+CHECK_DRAIN_RATE = float(os.getenv('CHECK_DRAIN_RATE', '20'))
+
+# Holds the queue the check was published on, so a user refresh can take over a sweep's lease
+CHECK_LEASE_KEY = 'certmon:check-lease:{}'
+
+# Deletes a lease only while it is held for the given queue, a lease taken
+# over by a high priority check stays until that check finishes.
+RELEASE_LEASE = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def queue_wait(queued, delay=0):
+    """Seconds a check published behind ``queued`` others and delayed ``delay`` seconds may wait to start."""
+    return int(delay + queued / CHECK_DRAIN_RATE) if CHECK_DRAIN_RATE > 0 else 0
+
+
+def acquire_check_leases(cert_ids, queue=QUEUE_DEFAULT, wait=0):
+    """Take the check lease for each certificate and return the IDs whose lease was free.
+
+    Certificates whose lease is already held have a check queued or in
+    flight, which will absorb this request. ``wait`` is how long the check
+    may sit in ``queue``, the lease covers that on top of CHECK_LEASE_TTL.
+    """
+    cert_ids = list(cert_ids)
+    if not cert_ids:
+        return []
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for cert_id in cert_ids:
+                pipe.set(CHECK_LEASE_KEY.format(cert_id), queue, nx=True, ex=CHECK_LEASE_TTL + wait)
+            acquired = pipe.execute()
+    except Exception as e:
+        # Without Redis we cannot dedupe, a duplicate check is better than a missed one
+        logger.error(f"Error acquiring check leases: {str(e)}")
+        return cert_ids
+    return [cert_id for cert_id, ok in zip(cert_ids, acquired) if ok]
+
+
+def release_check_leases(cert_ids, queue):
+    """Release the check leases of certificates whose check on ``queue`` has finished."""
+    cert_ids = list(cert_ids)
+    if not cert_ids:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for cert_id in cert_ids:
+                RELEASE_LEASE(keys=[CHECK_LEASE_KEY.format(cert_id)], args=[queue], client=pipe)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error releasing check leases: {str(e)}")
+
+
+def refresh_check_leases(cert_ids, queue, wait=0):
+    """Restart the check leases of certificates whose check is starting, or queued again after ``wait`` seconds.
+
+    A lease that expired is taken again for ``queue``, one still held keeps
+    its queue.
+    """
+    cert_ids = list(cert_ids)
+    if not cert_ids:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for cert_id in cert_ids:
+                key = CHECK_LEASE_KEY.format(cert_id)
+                pipe.set(key, queue, nx=True, ex=CHECK_LEASE_TTL + wait)
+                pipe.expire(key, CHECK_LEASE_TTL + wait)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"Error refreshing check leases: {str(e)}")
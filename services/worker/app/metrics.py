@@ -0,0 +1,64 @@
+import os
+import glob
+import logging
+from celery.signals import worker_init, worker_process_shutdown
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, start_http_server
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Port the worker exposes /metrics on, 0 disables it
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '9808'))
+# Set for the prefork pool so every child process' samples are aggregated
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+if PROMETHEUS_MULTIPROC_DIR:
+    # Metric files are created as soon as the metrics below are defined
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+SWEEP_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800)
+POOL_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+PHASE_SECONDS = Histogram(
+    'certmon_probe_phase_seconds', 'Time spent per phase of a certificate check', ['phase'],
+    buckets=PHASE_BUCKETS
+)
+PROBE_RESULTS = Counter('certmon_probe_results_total', 'Probe outcomes by result or error class', ['result'])
+PROBES_IN_FLIGHT = Gauge('certmon_probes_in_flight', 'Probes currently connecting or handshaking',
+                         multiprocess_mode='livesum')
+CHECKS_IN_FLIGHT = Gauge('certmon_checks_in_flight', 'Certificates in check tasks currently running',
+                         multiprocess_mode='livesum')
+WRITER_ROWS = Counter('certmon_writer_rows_total', 'Check results written back', ['kind'])
+SWEEP_SECONDS = Histogram('certmon_sweep_duration_seconds', 'Duration of sweep and dispatch tasks', ['task'],
+                          buckets=SWEEP_BUCKETS)
+DB_POOL_WAIT_SECONDS = Histogram('certmon_db_pool_wait_seconds', 'Time waiting to check out a database connection',
+                                 buckets=POOL_BUCKETS)
+DB_POOL_TIMEOUTS = Counter('certmon_db_pool_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT')
+DB_CONNECTION_HELD_SECONDS = Histogram('certmon_db_connection_held_seconds',
+                                       'Time a database connection stayed checked out', buckets=POOL_BUCKETS)
+DB_CONNECTIONS = Gauge('certmon_db_connections', 'Database connections open or checked out', ['state'],
+                       multiprocess_mode='livesum')
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Expose /metrics from the main worker process, before the pool forks."""
+    if not WORKER_METRICS_PORT:
+        return
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Samples left behind by a previous run would be summed in
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, '*.db')):
+            os.remove(path)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(WORKER_METRICS_PORT, registry=registry)
+    logger.info(f"Serving worker metrics on port {WORKER_METRICS_PORT}")
+
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    # Drops the live gauges of a pool process that exited
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,88 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey
+from sqlalchemy.ext.declarative import declarative_base
+
+# Define the Certificate model for the worker
+Base = declarative_base()
+
+class Certificate(Base):
+    __tablename__ = 'certificates'
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String(255), unique=True, nullable=False)
+    issuer = Column(String(255))
+    subject = Column(String(255))
+    serial_number = Column(String(255))
+    valid_from = Column(DateTime)
+    valid_until = Column(DateTime)
+    last_checked = Column(DateTime)
+    status = Column(String(50))
+    fingerprint = Column(String(64), index=True)
+    error_class = Column(String(32))
+    error_message = Column(String(255))
+    error_count = Column(Integer, nullable=False, default=0)
+    next_check_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChainCertificate(Base):
+    __tablename__ = 'chain_certificates'
+
+    fingerprint = Column(String(64), primary_key=True)
+    subject = Column(String(255))
+    issuer = Column(String(255))
+    serial_number = Column(String(255))
+    valid_from = Column(DateTime)
+    valid_until = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CertificateChainLink(Base):
+    __tablename__ = 'certificate_chain_links'
+
+    certificate_id = Column(Integer, ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), ForeignKey('chain_certificates.fingerprint'), nullable=False, index=True)
+
+class CertificateSan(Base):
+    __tablename__ = 'certificate_sans'
+
+    certificate_id = Column(Integer, ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    name = Column(String(255), primary_key=True, index=True)
+
+class CertificateHistory(Base):
+    __tablename__ = 'certificate_history'
+    # Partitioned by month so retention drops whole partitions, see app.history
+    __table_args__ = {'postgresql_partition_by': 'RANGE (started_at)'}
+
+    certificate_id = Column(Integer, ForeignKey('certificates.id', ondelete='CASCADE'), primary_key=True)
+    started_at = Column(DateTime, primary_key=True)
+    fingerprint = Column(String(64))
+    status = Column(String(50))
+    error_class = Column(String(32))
+    serial_number = Column(String(255))
+    issuer = Column(String(255))
+    valid_until = Column(DateTime)
+
+class CertificateSummary(Base):
+    __tablename__ = 'certificate_summary'
+
+    status = Column(String(50), primary_key=True)
+    issuer = Column(String(255), primary_key=True)
+    expires_on = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ImportJob(Base):
+    __tablename__ = 'import_jobs'
+
+    id = Column(String(36), primary_key=True)
+    filename = Column(String(255))
+    status = Column(String(20), nullable=False)
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    rows_added = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    rows_errored = Column(Integer, nullable=False, default=0)
+    errors = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,390 @@
+import asyncio
+import hashlib
+import ssl
+import _ssl
+import socket
+import os
+import time
+import logging
+from datetime import datetime
+from urllib.parse import urlparse
+import OpenSSL
+from cryptography import x509 as crypto_x509
+from .resolver import resolver
+from .metrics import PHASE_SECONDS, PROBE_RESULTS, PROBES_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# Probe engine settings
+PROBE_CONCURRENCY = int(os.getenv('PROBE_CONCURRENCY', '200'))
+# Dead hosts should fail fast, the TCP connect includes name resolution
+PROBE_CONNECT_TIMEOUT = float(os.getenv('PROBE_CONNECT_TIMEOUT', '5'))
+PROBE_HANDSHAKE_TIMEOUT = float(os.getenv('PROBE_HANDSHAKE_TIMEOUT', '10'))
+# Probe every address behind a name to catch load balanced backends serving different certificates
+PROBE_ALL_ADDRESSES = os.getenv('PROBE_ALL_ADDRESSES', 'false').lower() in ('1', 'true', 'yes')
+
+DEFAULT_PORT = 443
+
+# Failure classes stored in Certificate.error_class
+ERROR_INVALID_URL = 'invalid_url'
+ERROR_DNS = 'dns'
+ERROR_REFUSED = 'refused'
+ERROR_UNREACHABLE = 'unreachable'
+ERROR_CONNECT_TIMEOUT = 'connect_timeout'
+ERROR_HANDSHAKE_TIMEOUT = 'handshake_timeout'
+ERROR_HANDSHAKE = 'handshake'
+ERROR_HOSTNAME_MISMATCH = 'hostname_mismatch'
+ERROR_UNTRUSTED = 'untrusted'
+ERROR_EXPIRED = 'expired'
+ERROR_INCONSISTENT = 'inconsistent'
+ERROR_INTERNAL = 'internal'
+
+# OpenSSL X509_V_ERR codes reported by SSLCertVerificationError.verify_code
+X509_V_ERR_CERT_HAS_EXPIRED = 10
+X509_V_ERR_HOSTNAME_MISMATCH = 62
+X509_V_ERR_IP_ADDRESS_MISMATCH = 64
+
+# Fields kept for every certificate of a presented chain
+CHAIN_FIELDS = ('fingerprint', 'subject', 'issuer', 'serial_number', 'valid_from', 'valid_until')
+
+
+class ProbeError(Exception):
+    """A probe failure tagged with its error class."""
+
+    def __init__(self, error_class, message):
+        super().__init__(message)
+        self.error_class = error_class
+
+
+def parse_target(url):
+    """Return the (hostname, port) pair to probe for a certificate URL."""
+    if not url.startswith(('http://', 'https://')):
+        url = f'https://{url}'
+    parsed = urlparse(url)
+    return parsed.hostname, parsed.port or DEFAULT_PORT
+
+
+def probe_target(url):
+    """Return the normalized ``hostname:port:sni`` a URL is probed at, or None if it has no host.
+
+    URLs that differ only by scheme, path or case share a target and
+    therefore a single handshake.
+    """
+    try:
+        hostname, port = parse_target(url.strip())
+    except ValueError:
+        return None
+    if not hostname:
+        return None
+    hostname = hostname.rstrip('.')
+    # The SNI name is the hostname itself
+    return f'{hostname}:{port}:{hostname}'
+
+
+def fingerprint(der):
+    """Return the hex SHA-256 fingerprint of a DER encoded certificate."""
+    return hashlib.sha256(der).hexdigest()
+
+
+def name_string(name):
+    return ', '.join([f"{k.decode('utf-8')}={v.decode('utf-8')}" for k, v in name.get_components()])
+
+
+def subject_alt_names(x509):
+    """Return the DNS names and IP addresses a certificate is valid for."""
+    try:
+        extension = x509.to_cryptography().extensions.get_extension_for_class(crypto_x509.SubjectAlternativeName)
+    except crypto_x509.ExtensionNotFound:
+        return []
+    names = extension.value.get_values_for_type(crypto_x509.DNSName)
+    names += [str(address) for address in extension.value.get_values_for_type(crypto_x509.IPAddress)]
+    return list(dict.fromkeys(name.lower() for name in names if len(name) <= 255))
+
+
+def parse_certificate(der):
+    """Extract the fields we store from a DER encoded certificate."""
+    x509 = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_ASN1, der)
+
+    valid_from = datetime.strptime(x509.get_notBefore().decode('ascii'), '%Y%m%d%H%M%SZ')
+    valid_until = datetime.strptime(x509.get_notAfter().decode('ascii'), '%Y%m%d%H%M%SZ')
+    serial_number = format(x509.get_serial_number(), 'x').upper()  # Convert to uppercase hex
+
+    return {
+        'fingerprint': fingerprint(der),
+        'issuer': name_string(x509.get_issuer()),
+        'subject': name_string(x509.get_subject()),
+        'serial_number': serial_number,
+        'valid_from': valid_from,
+        'valid_until': valid_until,
+        'status': 'valid',
+        'error_class': None,
+        'error_message': None
+    }
+
+
+def parse_chain(chain):
+    """Parse a presented chain, leaf first, into the leaf's fields plus its chain and SANs."""
+    started = time.perf_counter()
+    parsed = [parse_certificate(der) for der in chain]
+    cert_info = parsed[0]
+    cert_info['chain'] = [{name: entry[name] for name in CHAIN_FIELDS} for entry in parsed]
+    leaf = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_ASN1, chain[0])
+    cert_info['sans'] = subject_alt_names(leaf)
+    PHASE_SECONDS.labels('parse').observe(time.perf_counter() - started)
+    return cert_info
+
+
+def unchanged_result(leaf_fingerprint):
+    """Result for an endpoint still presenting the certificate we already stored."""
+    return {
+        'fingerprint': leaf_fingerprint,
+        'unchanged': True,
+        'status': 'valid',
+        'error_class': None,
+        'error_message': None
+    }
+
+
+def classify_error(error, stage):
+    """Return the error class for an exception raised while connecting or during the handshake."""
+    if isinstance(error, ProbeError):
+        return error.error_class
+    if isinstance(error, asyncio.TimeoutError):
+        return ERROR_CONNECT_TIMEOUT if stage == 'connect' else ERROR_HANDSHAKE_TIMEOUT
+    if isinstance(error, socket.gaierror):
+        return ERROR_DNS
+    if isinstance(error, ssl.SSLCertVerificationError):
+        if error.verify_code in (X509_V_ERR_HOSTNAME_MISMATCH, X509_V_ERR_IP_ADDRESS_MISMATCH):
+            return ERROR_HOSTNAME_MISMATCH
+        if error.verify_code == X509_V_ERR_CERT_HAS_EXPIRED:
+            return ERROR_EXPIRED
+        return ERROR_UNTRUSTED
+    if isinstance(error, ssl.SSLError) or stage == 'handshake':
+        return ERROR_HANDSHAKE
+    if isinstance(error, ConnectionRefusedError):
+        return ERROR_REFUSED
+    if isinstance(error, OSError):
+        return ERROR_UNREACHABLE
+    return ERROR_INTERNAL
+
+
+def error_result(error_class, message):
+    return {
+        'issuer': None,
+        'subject': None,
+        'serial_number': None,
+        'valid_from': None,
+        'valid_until': None,
+        # An expired certificate is reported as such rather than as a generic error
+        'status': 'expired' if error_class == ERROR_EXPIRED else 'error',
+        'error_class': error_class,
+        'error_message': message[:255]
+    }
+
+
+def peer_chain(ssl_object):
+    """Return the chain presented by the peer as a list of DER certificates, leaf first."""
+    get_chain = getattr(ssl_object, 'get_unverified_chain', None)
+    if get_chain is None:
+        # Before Python 3.13 the chain is only reachable on the underlying _ssl object
+        get_chain = getattr(getattr(ssl_object, '_sslobj', None), 'get_unverified_chain', None)
+    chain = get_chain() if get_chain else None
+    if not chain:
+        return [ssl_object.getpeercert(binary_form=True)]
+    return [cert if isinstance(cert, bytes) else cert.public_bytes(_ssl.ENCODING_DER) for cert in chain]
+
+
+async def fetch_certificate(hostname, port, context, connect_timeout=PROBE_CONNECT_TIMEOUT,
+                            handshake_timeout=PROBE_HANDSHAKE_TIMEOUT, address=None):
+    """Perform a TLS handshake and return the presented chain as DER certificates, leaf first.
+
+    ``address`` is the already resolved address to connect to, the hostname
+    is still used for SNI and verification. The TCP connect and the TLS
+    handshake have separate timeouts. Failures are raised as
+    :class:`ProbeError` carrying their error class.
+    """
+    stage = 'connect'
+    writer = None
+    try:
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address or hostname, port),
+                                                timeout=connect_timeout)
+        connected = time.perf_counter()
+        PHASE_SECONDS.labels('connect').observe(connected - started)
+        stage = 'handshake'
+        await asyncio.wait_for(writer.start_tls(context, server_hostname=hostname), timeout=handshake_timeout)
+        PHASE_SECONDS.labels('handshake').observe(time.perf_counter() - connected)
+        return peer_chain(writer.get_extra_info('ssl_object'))
+    except ProbeError:
+        raise
+    except Exception as e:
+        message = f'{stage} timed out' if isinstance(e, asyncio.TimeoutError) else str(e)
+        raise ProbeError(classify_error(e, stage), message or type(e).__name__) from e
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=connect_timeout)
+            except Exception:
+                # The outcome is already known, a slow close is not an error
+                pass
+
+
+async def resolve(hostname):
+    try:
+        return await resolver.resolve(hostname)
+    except socket.gaierror as e:
+        raise ProbeError(ERROR_DNS, str(e))
+
+
+async def fetch_first(hostname, port, context, addresses, connect_timeout, handshake_timeout):
+    """Fetch the chain from the first address that accepts a connection."""
+    error = None
+    for address in addresses:
+        try:
+            return await fetch_certificate(hostname, port, context, connect_timeout, handshake_timeout, address)
+        except ProbeError as e:
+            # Only connection failures move on to the next address, like socket.create_connection
+            if e.error_class not in (ERROR_REFUSED, ERROR_UNREACHABLE, ERROR_CONNECT_TIMEOUT):
+                raise
+            error = e
+    raise error
+
+
+async def probe_addresses(hostname, port, context, addresses, connect_timeout, handshake_timeout,
+                          known_fingerprint=None):
+    """Probe every address of a host and report backends presenting different certificates.
+
+    Addresses that cannot be reached are skipped as long as one answers;
+    an unreachable backend is not a certificate problem. A backend whose
+    certificate fails verification while others pass makes the result
+    ``inconsistent``.
+    """
+    results = await asyncio.gather(*[
+        fetch_certificate(hostname, port, context, connect_timeout, handshake_timeout, address)
+        for address in addresses
+    ], return_exceptions=True)
+
+    # Leaf certificate -> (presented chain, addresses presenting it)
+    presented = {}
+    unreachable = []
+    # (address, error) of backends that answered but failed the handshake or verification
+    failed = []
+    for address, result in zip(addresses, results):
+        if isinstance(result, BaseException):
+            logger.info(f"Address {address} of {hostname} failed: {str(result)}")
+            if not isinstance(result, ProbeError):
+                result = ProbeError(classify_error(result, 'handshake'), str(result) or type(result).__name__)
+            if result.error_class in (ERROR_REFUSED, ERROR_UNREACHABLE, ERROR_CONNECT_TIMEOUT):
+                unreachable.append(result)
+            else:
+                failed.append((address, result))
+        else:
+            presented.setdefault(result[0], (result, []))[1].append(address)
+    if not presented:
+        raise failed[0][1] if failed else unreachable[0]
+    if len(presented) == 1 and not failed:
+        leaf, (chain, _) = next(iter(presented.items()))
+        if known_fingerprint and fingerprint(leaf) == known_fingerprint:
+            return unchanged_result(known_fingerprint)
+        return parse_chain(chain)
+
+    # Report the certificate that expires first, that is the one that will break
+    parsed = [(parse_chain(chain), served_by) for chain, served_by in presented.values()]
+    cert_info, _ = min(parsed, key=lambda item: item[0]['valid_until'])
+    details = [f"{info['serial_number']} on {', '.join(served_by)}" for info, served_by in parsed]
+    details += [f'{error.error_class} on {address}' for address, error in failed]
+    cert_info.update({
+        'status': 'inconsistent',
+        'error_class': ERROR_INCONSISTENT,
+        'error_message': f'{len(details)} different results: {"; ".join(details)}'[:255]
+    })
+    return cert_info
+
+
+async def probe(url, context=None, connect_timeout=PROBE_CONNECT_TIMEOUT, handshake_timeout=PROBE_HANDSHAKE_TIMEOUT,
+                all_addresses=PROBE_ALL_ADDRESSES, known_fingerprint=None):
+    """Get SSL certificate information for a given URL without blocking the event loop.
+
+    When the leaf certificate's fingerprint equals ``known_fingerprint`` the
+    certificate is not parsed again and an ``unchanged`` result is returned.
+    """
+    try:
+        try:
+            hostname, port = parse_target(url)
+        except ValueError as e:
+            raise ProbeError(ERROR_INVALID_URL, str(e))
+        if not hostname:
+            raise ProbeError(ERROR_INVALID_URL, f'Invalid URL: {url}')
+        if context is None:
+            context = ssl.create_default_context()
+        addresses = await resolve(hostname)
+        if all_addresses and len(addresses) > 1:
+            return await probe_addresses(hostname, port, context, addresses, connect_timeout, handshake_timeout,
+                                         known_fingerprint)
+        chain = await fetch_first(hostname, port, context, addresses, connect_timeout, handshake_timeout)
+        if known_fingerprint and fingerprint(chain[0]) == known_fingerprint:
+            return unchanged_result(known_fingerprint)
+        return parse_chain(chain)
+    except ProbeError as e:
+        logger.error(f"Error checking certificate for {url}: {e.error_class}: {str(e)}")
+        return error_result(e.error_class, str(e))
+    except Exception as e:
+        logger.error(f"Error checking certificate for {url}: {str(e)}")
+        return error_result(ERROR_INTERNAL, str(e))
+
+
+def probe_result(cert_info):
+    """Label a probe outcome for metrics: its error class, ``unchanged`` or ``valid``."""
+    if cert_info.get('error_class'):
+        return cert_info['error_class']
+    return 'unchanged' if cert_info.get('unchanged') else 'valid'
+
+
+async def probe_many(targets, concurrency=PROBE_CONCURRENCY, connect_timeout=PROBE_CONNECT_TIMEOUT,
+                     handshake_timeout=PROBE_HANDSHAKE_TIMEOUT, fingerprints=None):
+    """Probe ``(key, url)`` pairs concurrently, yielding ``(key, info)`` as each one completes.
+
+    At most ``concurrency`` probes are in flight at any time and each one is
+    bounded by the connect and handshake timeouts. ``fingerprints`` maps keys
+    to the leaf fingerprint already stored for them, see :func:`probe`.
+    """
+    fingerprints = fingerprints or {}
+    semaphore = asyncio.Semaphore(concurrency)
+    context = ssl.create_default_context()
+
+    # Resolve every hostname of the batch up front, concurrently and outside the probe slots
+    hostnames = set()
+    for _, url in targets:
+        try:
+            hostname, _ = parse_target(url)
+        except ValueError:
+            continue
+        if hostname:
+            hostnames.add(hostname)
+    resolver.prefetch(hostnames)
+    await resolver.resolve_many(hostnames)
+    resolver.persist()
+
+    async def run(key, url):
+        async with semaphore:
+            with PROBES_IN_FLIGHT.track_inprogress():
+                info = await probe(url, context, connect_timeout, handshake_timeout,
+                                   known_fingerprint=fingerprints.get(key))
+        PROBE_RESULTS.labels(probe_result(info)).inc()
+        return key, info
+
+    for task in asyncio.as_completed([run(key, url) for key, url in targets]):
+        yield await task
+
+
+def probe_all(targets, concurrency=PROBE_CONCURRENCY, connect_timeout=PROBE_CONNECT_TIMEOUT,
+              handshake_timeout=PROBE_HANDSHAKE_TIMEOUT):
+    """Synchronous wrapper around :func:`probe_many` returning a ``{key: info}`` dict."""
+    async def collect():
+        return {
+            key: info
+            async for key, info in probe_many(targets, concurrency, connect_timeout, handshake_timeout)
+        }
+
+    return asyncio.run(collect())
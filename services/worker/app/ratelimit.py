@@ -0,0 +1,92 @@
+import os
+import ipaddress
+import logging
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Handshakes allowed per second against one host group, and the burst allowed on top
+HOST_RATE_LIMIT = float(os.getenv('HOST_RATE_LIMIT', '20'))
+HOST_RATE_BURST = int(os.getenv('HOST_RATE_BURST', '40'))
+# What hosts share a bucket: 'address' (the resolved IP), 'prefix' (its /24 or /48) or 'domain'
+HOST_RATE_GROUPING = os.getenv('HOST_RATE_GROUPING', 'address')
+
+RATE_LIMIT_KEY = 'certmon:ratelimit:{}'
+
+# Second level labels under which country code TLDs hand out registrations
+SECOND_LEVEL_LABELS = {'co', 'com', 'net', 'org', 'gov', 'edu', 'ac', 'ne', 'or'}
+
+# Token bucket kept in a Redis hash. Takes one token if available and
+# returns "0", otherwise returns the seconds until a token frees up.
+TAKE_TOKEN = redis_client.register_script("""
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+""")
+
+
+def registrable_domain(hostname):
+    """Return the registrable domain of a hostname.
+
+    This is an approximation of the public suffix list that treats
+    ``example.co.uk`` style registrations as three labels.
+    """
+    labels = hostname.split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def host_group(hostname, addresses=None, grouping=HOST_RATE_GROUPING):
+    """Return the rate limit bucket of a hostname.
+
+    Grouped by address, hosts served from the same machine or load balancer
+    share a bucket while a fleet of ``*.example.com`` hosts on different
+    servers does not. Without resolved ``addresses`` the registrable domain
+    is used. IP literals are their own address.
+    """
+    hostname = hostname.lower().rstrip('.')
+    try:
+        addresses = [str(ipaddress.ip_address(hostname))]
+    except ValueError:
+        if not addresses or grouping == 'domain':
+            return registrable_domain(hostname)
+    # The lowest address, so every name behind the same address set lands in the same bucket
+    address = min((ipaddress.ip_address(address) for address in addresses), key=lambda ip: (ip.version, ip))
+    if grouping == 'prefix':
+        return str(ipaddress.ip_network(f'{address}/{24 if address.version == 4 else 48}', strict=False))
+    return str(address)
+
+
+def take_tokens(groups):
+    """Take one handshake token for each entry of ``groups``.
+
+    Returns a list with 0 for every allowed handshake and, for denied ones,
+    the number of seconds until the group has a token again.
+    """
+    groups = list(groups)
+    if not groups or HOST_RATE_LIMIT <= 0:
+        return [0] * len(groups)
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for group in groups:
+                TAKE_TOKEN(keys=[RATE_LIMIT_KEY.format(group)], args=[HOST_RATE_LIMIT, HOST_RATE_BURST], client=pipe)
+            return [float(wait) for wait in pipe.execute()]
+    except Exception as e:
+        # Do not stall sweeps when Redis is unavailable
+        logger.error(f"Error taking rate limit tokens: {str(e)}")
+        return [0] * len(groups)
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import json
+import time
+import socket
+import logging
+from .store import redis_client
+from .metrics import PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Resolver settings
+RESOLVER_CACHE_TTL = int(os.getenv('RESOLVER_CACHE_TTL', '300'))
+RESOLVER_NEGATIVE_TTL = int(os.getenv('RESOLVER_NEGATIVE_TTL', '60'))
+RESOLVER_TIMEOUT = float(os.getenv('RESOLVER_TIMEOUT', '5'))
+RESOLVER_CONCURRENCY = int(os.getenv('RESOLVER_CONCURRENCY', '100'))
+# Share resolved addresses between worker processes through Redis
+RESOLVER_SHARED_CACHE = os.getenv('RESOLVER_SHARED_CACHE', 'false').lower() in ('1', 'true', 'yes')
+
+DNS_CACHE_KEY = 'certmon:dns:{}'
+
+
+class Resolver:
+    """Asynchronous hostname resolver with a per-process TTL cache.
+
+    Lookups run through the event loop's ``getaddrinfo`` so they never block
+    other probes, concurrent lookups of the same name share one query, and
+    failed lookups are cached for a shorter time. With ``shared=True`` the
+    cache is also read from and written to Redis, in bulk around each batch.
+    """
+
+    def __init__(self, ttl=RESOLVER_CACHE_TTL, negative_ttl=RESOLVER_NEGATIVE_TTL, timeout=RESOLVER_TIMEOUT,
+                 shared=RESOLVER_SHARED_CACHE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.shared = shared
+        # hostname -> (expires_at, addresses or None, error message or None)
+        self._cache = {}
+        self._pending = {}
+        self._dirty = set()
+
+    def _lookup(self, hostname):
+        entry = self._cache.get(hostname)
+        if entry and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def _store(self, hostname, addresses=None, error=None):
+        ttl = self.ttl if addresses else self.negative_ttl
+        self._cache[hostname] = (time.monotonic() + ttl, addresses, error)
+        self._dirty.add(hostname)
+
+    async def _query(self, hostname):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            self._store(hostname, error='DNS lookup timed out')
+            return
+        except (socket.gaierror, OSError, UnicodeError) as e:
+            self._store(hostname, error=str(e))
+            return
+        finally:
+            # Only real lookups are timed, cache hits never get here
+            PHASE_SECONDS.labels('dns').observe(time.perf_counter() - started)
+        # Keep the resolver's order, which already prefers the right address family
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            self._store(hostname, error='No addresses found')
+            return
+        self._store(hostname, addresses=addresses)
+
+    async def resolve(self, hostname):
+        """Return the addresses of ``hostname``, raising ``socket.gaierror`` if it does not resolve."""
+        entry = self._lookup(hostname)
+        if entry is None:
+            pending = self._pending.get(hostname)
+            if pending is None:
+                pending = asyncio.ensure_future(self._query(hostname))
+                self._pending[hostname] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(hostname, None))
+            await asyncio.shield(pending)
+            entry = self._cache[hostname]
+        _, addresses, error = entry
+        if error:
+            raise socket.gaierror(error)
+        return addresses
+
+    def cached(self, hostname):
+        """Return the cached addresses of ``hostname``, or None if it is not cached or did not resolve."""
+        entry = self._lookup(hostname)
+        return entry[1] if entry else None
+
+    async def resolve_many(self, hostnames, concurrency=RESOLVER_CONCURRENCY):
+        """Resolve ``hostnames`` concurrently to warm the cache, ignoring failures."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(hostname):
+            async with semaphore:
+                try:
+                    await self.resolve(hostname)
+                except socket.gaierror:
+                    pass
+
+        await asyncio.gather(*[run(hostname) for hostname in set(hostnames) if not self._lookup(hostname)])
+
+    def prefetch(self, hostnames):
+        """Load entries for ``hostnames`` from the shared Redis cache."""
+        if not self.shared:
+            return
+        hostnames = [hostname for hostname in set(hostnames) if not self._lookup(hostname)]
+        if not hostnames:
+            return
+        try:
+            with redis_client.pipeline(transaction=False) as pipe:
+                for hostname in hostnames:
+                    pipe.get(DNS_CACHE_KEY.format(hostname))
+                    pipe.ttl(DNS_CACHE_KEY.format(hostname))
+                replies = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading shared DNS cache: {str(e)}")
+            return
+        now = time.monotonic()
+        for hostname, payload, ttl in zip(hostnames, replies[::2], replies[1::2]):
+            if payload and ttl and ttl > 0:
+                addresses, error = json.loads(payload)
+                self._cache[hostname] = (now + ttl, addresses, error)
+
+    def persist(self):
+        """Write entries resolved since the last call to the shared Redis cache."""
+        dirty, self._dirty = self._dirty, set()
+        if not self.shared or not dirty:
+            return
+        now = time.monotonic()
+        try:
+            with redis_client.pipeline(transaction=False) as pipe:
+                for hostname in dirty:
+                    expires_at, addresses, error = self._cache[hostname]
+                    ttl = int(expires_at - now)
+                    if ttl > 0:
+                        pipe.set(DNS_CACHE_KEY.format(hostname), json.dumps([addresses, error]), ex=ttl)
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing shared DNS cache: {str(e)}")
+
+
+# Process wide resolver, each prefork child keeps its own cache
+resolver = Resolver()
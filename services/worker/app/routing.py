@@ -0,0 +1,37 @@
+import os
+from datetime import datetime
+
+# Celery queues served by the high, default and low priority worker pools
+QUEUE_HIGH = 'high_priority'
+QUEUE_DEFAULT = 'default'
+QUEUE_LOW = 'low_priority'
+QUEUES = (QUEUE_HIGH, QUEUE_DEFAULT, QUEUE_LOW)
+
+# Certificates expiring within this many days are checked on the high priority pool
+ROUTE_HIGH_DAYS = int(os.getenv('ROUTE_HIGH_DAYS', '7'))
+# Certificates expiring later than this many days are checked on the low priority pool
+ROUTE_LOW_DAYS = int(os.getenv('ROUTE_LOW_DAYS', '30'))
+# Certificates failing this many times in a row are demoted to the low priority pool
+ROUTE_DEMOTE_ERRORS = int(os.getenv('ROUTE_DEMOTE_ERRORS', '3'))
+
+
+def check_queue(valid_until, error_count, user_initiated=False, now=None):
+    """Pick the queue a certificate check should run on.
+
+    User-initiated checks and certificates close to expiry go to the high
+    priority pool, failing or never checked certificates to the default pool
+    and healthy long-lived certificates to the low priority pool. Endpoints
+    that keep failing are demoted so they cannot crowd out healthy checks.
+    """
+    if user_initiated:
+        return QUEUE_HIGH
+    if error_count >= ROUTE_DEMOTE_ERRORS:
+        return QUEUE_LOW
+    if valid_until is None or error_count:
+        return QUEUE_DEFAULT
+    days_remaining = (valid_until - (now or datetime.utcnow())).days
+    if days_remaining <= ROUTE_HIGH_DAYS:
+        return QUEUE_HIGH
+    if days_remaining <= ROUTE_LOW_DAYS:
+        return QUEUE_DEFAULT
+    return QUEUE_LOW
@@ -0,0 +1,128 @@
+import os
+import math
+import random
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from .models import Certificate
+from .settings import get_settings
+from .probe import (
+    ERROR_CONNECT_TIMEOUT, ERROR_DNS, ERROR_EXPIRED, ERROR_HANDSHAKE, ERROR_HANDSHAKE_TIMEOUT,
+    ERROR_HOSTNAME_MISMATCH, ERROR_INCONSISTENT, ERROR_INTERNAL, ERROR_INVALID_URL, ERROR_REFUSED,
+    ERROR_UNREACHABLE, ERROR_UNTRUSTED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Scheduler settings
+SCHEDULE_ERROR_RETRY_MINUTES = int(os.getenv('SCHEDULE_ERROR_RETRY_MINUTES', '15'))
+SCHEDULE_JITTER = float(os.getenv('SCHEDULE_JITTER', '0.1'))
+# How long a dispatched certificate stays claimed before it becomes due again
+DISPATCH_LEASE_MINUTES = int(os.getenv('DISPATCH_LEASE_MINUTES', '30'))
+DISPATCH_BATCH_LIMIT = int(os.getenv('DISPATCH_BATCH_LIMIT', '5000'))
+# Seconds between runs of dispatch_due_certificates
+DISPATCH_INTERVAL = int(os.getenv('DISPATCH_INTERVAL', '60'))
+# Each dispatch is published in slices this many seconds apart rather than all at once
+DISPATCH_SLICE_SECONDS = int(os.getenv('DISPATCH_SLICE_SECONDS', '10'))
+
+# Check interval by days remaining until expiry, first matching tier wins
+EXPIRY_TIERS = [
+    (0, timedelta(hours=6)),     # already expired, watch for the replacement
+    (7, timedelta(hours=1)),
+    (30, timedelta(hours=6)),
+    (90, timedelta(hours=24)),
+]
+
+
+# First retry delay per error class, doubled for every further consecutive failure.
+# Transient network failures are retried soon, configuration problems on the
+# remote side only change when someone fixes them and are retried rarely.
+ERROR_RETRY_POLICIES = {
+    ERROR_HANDSHAKE_TIMEOUT: timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_HANDSHAKE: timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_INTERNAL: timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_CONNECT_TIMEOUT: timedelta(minutes=2 * SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_REFUSED: timedelta(minutes=2 * SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_UNREACHABLE: timedelta(minutes=2 * SCHEDULE_ERROR_RETRY_MINUTES),
+    ERROR_DNS: timedelta(hours=1),
+    ERROR_INCONSISTENT: timedelta(hours=1),
+    ERROR_HOSTNAME_MISMATCH: timedelta(hours=6),
+    ERROR_UNTRUSTED: timedelta(hours=6),
+    ERROR_EXPIRED: timedelta(hours=6),
+    ERROR_INVALID_URL: timedelta(hours=24),
+}
+
+
+def next_check_interval(valid_until, error_class, error_count, now):
+    """Return how long to wait before checking a certificate again."""
+    max_interval = timedelta(hours=get_settings()['check_interval_hours'])
+
+    if error_class:
+        # Back off exponentially from the class' first retry delay
+        first_retry = ERROR_RETRY_POLICIES.get(error_class, timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES))
+        return min(first_retry * 2 ** max(error_count - 1, 0), max_interval)
+
+    if not valid_until:
+        return timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES)
+
+    remaining = valid_until - now
+    interval = max_interval
+    for days, tier_interval in EXPIRY_TIERS:
+        if remaining <= timedelta(days=days):
+            interval = tier_interval
+            break
+
+    if remaining > timedelta(0):
+        # Make sure the certificate is looked at again around the moment it expires
+        interval = min(interval, max(remaining, timedelta(minutes=SCHEDULE_ERROR_RETRY_MINUTES)))
+    return min(interval, max_interval)
+
+
+def schedule_next_check(cert_info, previous_error_count, now=None):
+    """Fill in ``error_count`` and ``next_check_at`` for a probe result."""
+    now = now or datetime.utcnow()
+    error_class = cert_info.get('error_class')
+    error_count = previous_error_count + 1 if error_class else 0
+    interval = next_check_interval(cert_info.get('valid_until'), error_class, error_count, now)
+    # Spread checks out so certificates added together do not stay in lockstep
+    interval *= 1 + random.uniform(-SCHEDULE_JITTER, SCHEDULE_JITTER)
+
+    cert_info['error_count'] = error_count
+    cert_info['next_check_at'] = now + interval
+    return cert_info
+
+
+def dispatch_limit():
+    """Return how many due certificates one dispatch run may claim under the configured sweep rate."""
+    sweep_rate = get_settings()['sweep_rate']
+    if not sweep_rate:
+        return DISPATCH_BATCH_LIMIT
+    return min(DISPATCH_BATCH_LIMIT, math.ceil(sweep_rate * DISPATCH_INTERVAL / 60))
+
+
+def claim_due_certificates(engine, limit=DISPATCH_BATCH_LIMIT, lease_minutes=DISPATCH_LEASE_MINUTES):
+    """Claim up to ``limit`` certificates that are due for a check.
+
+    Returns ``(id, valid_until, error_count)`` rows for the claimed certificates.
+
+    Claimed rows have ``next_check_at`` pushed forward by the lease so that
+    concurrent dispatchers skip them; the check result replaces it with the
+    real next check time.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(Certificate.id)
+        .where(Certificate.next_check_at <= now)
+        .order_by(Certificate.next_check_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Certificate)
+        .where(Certificate.id.in_(due))
+        .values(next_check_at=now + timedelta(minutes=lease_minutes))
+        .returning(Certificate.id, Certificate.valid_until, Certificate.error_count)
+    )
+    with engine.begin() as conn:
+        return conn.execute(stmt).all()
@@ -0,0 +1,43 @@
+import os
+import time
+import logging
+from .store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Schedule settings changed at runtime through the API's PUT /settings, see api/app/settings.py
+SETTINGS_KEY = 'certmon:settings'
+
+# Used until a setting has been changed through the API
+DEFAULT_SETTINGS = {
+    # Hours between checks of a healthy certificate, and the longest any back-off may wait
+    'check_interval_hours': int(os.getenv('SCHEDULE_MAX_INTERVAL_HOURS', '72')),
+    # Checks dispatched per minute at most, 0 dispatches everything due up to DISPATCH_BATCH_LIMIT
+    'sweep_rate': int(os.getenv('SWEEP_RATE', '0')),
+}
+
+# Seconds settings are reused before Redis is read again, they are needed for every check result
+SETTINGS_CACHE_SECONDS = int(os.getenv('SETTINGS_CACHE_SECONDS', '30'))
+
+_cached = None
+_cached_at = 0
+
+
+def get_settings():
+    """Return the current schedule settings, refreshed from Redis every SETTINGS_CACHE_SECONDS."""
+    global _cached, _cached_at
+    if _cached is not None and time.monotonic() - _cached_at < SETTINGS_CACHE_SECONDS:
+        return _cached
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        for name, value in redis_client.hgetall(SETTINGS_KEY).items():
+            name = name.decode()
+            if name in settings:
+                settings[name] = int(value)
+    except Exception as e:
+        # Keep scheduling with the last known settings until Redis is back
+        logger.error(f"Error reading schedule settings: {str(e)}")
+        if _cached is not None:
+            return _cached
+    _cached, _cached_at = settings, time.monotonic()
+    return settings
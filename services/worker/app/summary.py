@@ -0,0 +1,67 @@
+import logging
+from collections import Counter
+from datetime import date
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert
+from .models import Certificate, CertificateSummary
+
+logger = logging.getLogger(__name__)
+
+# Stands in for a missing expiry date, the summary's key columns cannot be NULL
+NO_EXPIRY = date.max
+
+
+def summary_key(status, issuer, valid_until):
+    """Return the ``(status, issuer, expires_on)`` aggregate a certificate is counted in."""
+    return status or '', issuer or '', valid_until.date() if valid_until else NO_EXPIRY
+
+
+def summary_deltas(previous, current):
+    """Return the count changes for a certificate moving from ``previous`` to ``current``.
+
+    Either side may be None for a certificate that is created or deleted.
+    """
+    deltas = Counter()
+    if previous is not None:
+        deltas[summary_key(previous.status, previous.issuer, previous.valid_until)] -= 1
+    if current is not None:
+        deltas[summary_key(current.get('status'), current.get('issuer'), current.get('valid_until'))] += 1
+    return deltas
+
+
+def apply_summary_deltas(conn, deltas):
+    """Add ``{key: delta}`` to the summary counts in one statement.
+
+    Keys are written in sorted order so concurrent writers lock the shared
+    rows in the same order and cannot deadlock.
+    """
+    rows = [
+        {'status': status, 'issuer': issuer, 'expires_on': expires_on, 'count': delta}
+        for (status, issuer, expires_on), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    table = CertificateSummary.__table__
+    stmt = insert(table).values(rows)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['status', 'issuer', 'expires_on'],
+        set_={'count': table.c.count + stmt.excluded.count}
+    ))
+
+
+def rebuild_summary(conn):
+    """Recount the summary from the certificates table, correcting any drift."""
+    table = CertificateSummary.__table__
+    # Writers block on the lock, their deltas then apply on top of the fresh counts
+    conn.execute(text(f'LOCK TABLE {table.name} IN EXCLUSIVE MODE'))
+    conn.execute(table.delete())
+    key = (
+        func.coalesce(Certificate.status, ''),
+        func.coalesce(Certificate.issuer, ''),
+        func.coalesce(func.date(Certificate.valid_until), NO_EXPIRY),
+    )
+    conn.execute(table.insert().from_select(
+        ['status', 'issuer', 'expires_on', 'count'],
+        # Group by position, the bound defaults make the expressions differ textually
+        select(*key, func.count()).group_by(text('1, 2, 3'))
+    ))
@@ -1,139 +1,334 @@
+import asyncio
+import io
+import math
+from collections import defaultdict
+import json
 from datetime import datetime
-import ssl
-import socket
-import OpenSSL
-from urllib.parse import urlparse
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select
 import os
 import logging
 from . import app
+from .models import Certificate
+from .database import Session, get_engine
+from .importer import RedisUpload, run_import, update_job, IMPORT_READ_SIZE
+from .probe import probe, probe_many, probe_target, parse_target
+from .ratelimit import host_group, take_tokens, HOST_RATE_LIMIT, HOST_RATE_GROUPING
+from .resolver import resolver
+from .cache import get_cached_results, cache_results
+from .store import redis_client, IMPORT_UPLOAD_KEY
+from .routing import check_queue, QUEUE_HIGH, QUEUE_DEFAULT
+from .leases import acquire_check_leases, refresh_check_leases, release_check_leases, queue_wait
+from .scheduler import (
+    claim_due_certificates, dispatch_limit, schedule_next_check, DISPATCH_INTERVAL, DISPATCH_SLICE_SECONDS,
+)
+from .writer import ResultWriter, mark_errors
+from .history import has_changed, ensure_partitions, drop_expired_partitions
+from .summary import rebuild_summary
+from .metrics import CHECKS_IN_FLIGHT, SWEEP_SECONDS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database setup
-engine = create_engine(os.getenv('DATABASE_URL'))
-Session = sessionmaker(bind=engine)
+# Number of certificate IDs handed to each check_certificates task
+SWEEP_CHUNK_SIZE = int(os.getenv('SWEEP_CHUNK_SIZE', '500'))
 
-# Define the Certificate model for the worker
-Base = declarative_base()
-
-class Certificate(Base):
-    __tablename__ = 'certificates'
-
-    id = Column(Integer, primary_key=True)
-    url = Column(String(255), unique=True, nullable=False)
-    issuer = Column(String(255))
-    subject = Column(String(255))
-    serial_number = Column(String(255))
-    valid_from = Column(DateTime)
-    valid_until = Column(DateTime)
-    last_checked = Column(DateTime)
-    status = Column(String(50))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+# Columns a check needs from the stored certificate
+CHECK_COLUMNS = (Certificate.id, Certificate.url, Certificate.error_count, Certificate.valid_until,
+                 Certificate.status, Certificate.error_class, Certificate.issuer, Certificate.fingerprint)
 
 def get_certificate_info(url):
     """Get SSL certificate information for a given URL."""
-    try:
-        logger.info(f"Checking certificate for URL: {url}")
-        if not url.startswith(('http://', 'https://')):
-            url = f'https://{url}'
-        
-        parsed = urlparse(url)
-        hostname = parsed.netloc
-        if ':' in hostname:
-            hostname = hostname.split(':')[0]
-
-        context = ssl.create_default_context()
-        with socket.create_connection((hostname, 443)) as sock:
-            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-                cert = ssock.getpeercert(binary_form=True)
-                x509 = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_ASN1, cert)
-                
-                issuer = x509.get_issuer().get_components()
-                subject = x509.get_subject().get_components()
-                valid_from = datetime.strptime(x509.get_notBefore().decode('ascii'), '%Y%m%d%H%M%SZ')
-                valid_until = datetime.strptime(x509.get_notAfter().decode('ascii'), '%Y%m%d%H%M%SZ')
-                
-                issuer_str = ', '.join([f"{k.decode('utf-8')}={v.decode('utf-8')}" for k, v in issuer])
-                subject_str = ', '.join([f"{k.decode('utf-8')}={v.decode('utf-8')}" for k, v in subject])
-                serial_number = format(x509.get_serial_number(), 'x').upper()  # Convert to uppercase hex
-                
-                return {
-                    'issuer': issuer_str,
-                    'subject': subject_str,
-                    'serial_number': serial_number,
-                    'valid_from': valid_from,
-                    'valid_until': valid_until,
-                    'status': 'valid'
-                }
-    except Exception as e:
-        logger.error(f"Error checking certificate for {url}: {str(e)}")
-        return {
-            'issuer': None,
-            'subject': None,
-            'serial_number': None,
-            'valid_from': None,
-            'valid_until': None,
-            'status': f'error: {str(e)}'
-        }
-
-@app.task(name='app.tasks.check_certificate')
-def check_certificate(cert_id):
+    logger.info(f"Checking certificate for URL: {url}")
+    return asyncio.run(probe(url))
+
+@app.task(name='app.tasks.check_certificate', bind=True)
+def check_certificate(self, cert_id):
     """Check certificate information for a given certificate ID."""
-    session = Session()
+    session = Session(bind=get_engine())
+    deferred = {}
+    queue = self.request.delivery_info.get('routing_key') or QUEUE_HIGH
+    # The lease was taken when the check was queued and may be close to expiring
+    refresh_check_leases([cert_id], queue)
     try:
         logger.info(f"Checking certificate for ID: {cert_id}")
-        cert = session.query(Certificate).get(cert_id)
+        cert = (
+            session.query(*CHECK_COLUMNS)
+            .filter(Certificate.id == cert_id)
+            .first()
+        )
+        session.close()
         if not cert:
             logger.error(f"Certificate not found for ID: {cert_id}")
             return
 
-        cert_info = get_certificate_info(cert.url)
-        
-        # Update certificate information
-        cert.issuer = cert_info['issuer']
-        cert.subject = cert_info['subject']
-        cert.serial_number = cert_info['serial_number']
-        cert.valid_from = cert_info['valid_from']
-        cert.valid_until = cert_info['valid_until']
-        cert.last_checked = datetime.utcnow()
-        cert.status = cert_info['status']
-        cert.updated_at = datetime.utcnow()
-        
-        session.commit()
+        with CHECKS_IN_FLIGHT.track_inprogress(), ResultWriter(get_engine()) as writer:
+            deferred = asyncio.run(run_checks([cert], writer))
+        if deferred:
+            defer_checks(deferred, queue)
+            return
         logger.info(f"Certificate updated for ID: {cert_id}")
     except Exception as e:
         logger.error(f"Error checking certificate {cert_id}: {str(e)}")
-        session.rollback()
         # Update status to error if something goes wrong
         try:
-            cert = session.query(Certificate).get(cert_id)
-            if cert:
-                cert.status = 'error'
-                cert.last_checked = datetime.utcnow()
-                cert.updated_at = datetime.utcnow()
-                session.commit()
-        except:
-            session.rollback()
+            mark_errors(get_engine(), [cert_id])
+        except Exception:
+            logger.error(f"Error marking certificate {cert_id} as failed")
     finally:
         session.close()
+        if cert_id not in deferred:
+            release_check_leases([cert_id], queue)
 
 @app.task(name='app.tasks.check_all_certificates')
-def check_all_certificates():
-    """Check all certificates in the database."""
-    session = Session()
+@SWEEP_SECONDS.labels('check_all_certificates').time()
+def check_all_certificates(chunk_size=None):
+    """Check all certificates in the database, publishing batch tasks per chunk of IDs."""
+    chunk_size = chunk_size or SWEEP_CHUNK_SIZE
+    session = Session(bind=get_engine())
     try:
-        certificates = session.query(Certificate).all()
-        for cert in certificates:
-            # Schedule individual certificate checks
-            check_certificate.delay(cert.id)
-        logger.info(f"Scheduled checks for {len(certificates)} certificates")
+        # Stream IDs through a server-side cursor instead of loading every row
+        result = session.execute(
+            select(Certificate.id, Certificate.valid_until, Certificate.error_count)
+            .order_by(Certificate.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        scheduled = 0
+        batches = 0
+        for partition in result.partitions():
+            # Later chunks wait behind the earlier ones, their leases must outlast that
+            publish_routed_checks(partition, queued=scheduled)
+            scheduled += len(partition)
+            batches += 1
+        logger.info(f"Scheduled checks for {scheduled} certificates in {batches} chunks")
     except Exception as e:
         logger.error(f"Error scheduling certificate checks: {str(e)}")
     finally:
         session.close()
+
+async def run_checks(certificates, writer):
+    """Probe certificates and hand each scheduled result to the writer as it arrives.
+
+    Certificates sharing an endpoint are probed once, and endpoints probed
+    recently by any worker are served from the shared result cache. When
+    the presented leaf matches the stored fingerprint only the check times
+    are written.
+    Endpoints whose host group is over its rate limit are not probed;
+    a ``{cert_id: countdown}`` dict of those certificates is returned so
+    they can be queued again.
+    """
+    groups = defaultdict(list)
+    cacheable = set()
+    for cert in certificates:
+        target = probe_target(cert.url)
+        if target:
+            cacheable.add(target)
+        # URLs without a usable host are probed on their own so they still get an error result
+        groups[target or cert.url].append(cert)
+
+    def fan_out(target, cert_info):
+        for cert in groups[target]:
+            if is_unchanged(cert, cert_info):
+                # Same certificate as stored, only the check times move
+                writer.add(cert.id, schedule_next_check({'unchanged': True, 'valid_until': cert.valid_until},
+                                                        cert.error_count))
+            else:
+                writer.add(cert.id, schedule_next_check(dict(cert_info), cert.error_count),
+                           changed=has_changed(cert, cert_info))
+
+    loop = asyncio.get_running_loop()
+
+    async def flush_if_due():
+        if writer.due():
+            # A flush is a blocking Postgres transaction, off the loop the handshakes in flight keep their timeouts
+            await loop.run_in_executor(None, writer.write, writer.take())
+
+    cached = get_cached_results(cacheable)
+    for target, cert_info in cached.items():
+        fan_out(target, cert_info)
+    await flush_if_due()
+
+    misses = [(target, certs[0].url) for target, certs in groups.items() if target not in cached]
+
+    # Consult the per-host rate limiter before connecting
+    limited = [(target, url) for target, url in misses if target in cacheable]
+    hostnames = [parse_target(url)[0] for _, url in limited]
+    if HOST_RATE_GROUPING != 'domain':
+        # Buckets are keyed by address, the lookups are cached for the probes that follow
+        resolver.prefetch(hostnames)
+        await resolver.resolve_many(hostnames)
+    host_groups = [host_group(hostname, resolver.cached(hostname)) for hostname in hostnames]
+    deferred = {}
+    denied_per_group = defaultdict(int)
+    for (target, _), group, wait in zip(limited, host_groups, take_tokens(host_groups)):
+        if wait:
+            # Spread the retries of one host group out at its allowed rate
+            countdown = wait + denied_per_group[group] / HOST_RATE_LIMIT
+            denied_per_group[group] += 1
+            for cert in groups[target]:
+                deferred[cert.id] = countdown
+    if deferred:
+        misses = [(target, url) for target, url in misses if groups[target][0].id not in deferred]
+
+    # Let the probe skip parsing where every certificate on the endpoint still has a valid stored certificate
+    fingerprints = {}
+    for target, _ in misses:
+        stored = {cert.fingerprint if cert.status == 'valid' else None for cert in groups[target]}
+        if len(stored) == 1 and None not in stored:
+            fingerprints[target] = stored.pop()
+
+    # Written in one pipeline after probing, a blocking round trip per result would stall the loop
+    probed = {}
+    async for target, cert_info in probe_many(misses, fingerprints=fingerprints):
+        if target in cacheable and not cert_info.get('unchanged'):
+            probed[target] = cert_info
+        fan_out(target, cert_info)
+        await flush_if_due()
+    cache_results(probed)
+    return deferred
+
+def is_unchanged(cert, cert_info):
+    """Whether a result shows the valid certificate already stored for ``cert``."""
+    return (cert_info.get('status') == 'valid' and cert.status == 'valid'
+            and cert.fingerprint is not None and cert_info.get('fingerprint') == cert.fingerprint)
+
+def defer_checks(deferred, queue=QUEUE_DEFAULT):
+    """Queue rate limited certificates again on ``queue`` once their host group has capacity.
+
+    The certificates keep the check lease they already hold, extended over the countdown.
+    """
+    batches = defaultdict(list)
+    for cert_id, countdown in deferred.items():
+        batches[math.ceil(countdown)].append(cert_id)
+    with app.producer_or_acquire() as producer:
+        for countdown, cert_ids in batches.items():
+            refresh_check_leases(cert_ids, queue, wait=countdown)
+            check_certificates.apply_async(args=[cert_ids], countdown=countdown, queue=queue, producer=producer)
+    logger.info(f"Deferred {len(deferred)} rate limited certificate checks")
+
+@app.task(name='app.tasks.check_certificates', bind=True)
+def check_certificates(self, cert_ids):
+    """Check a batch of certificates concurrently in a single worker process."""
+    session = Session(bind=get_engine())
+    writer = ResultWriter(get_engine())
+    deferred = {}
+    queue = self.request.delivery_info.get('routing_key') or QUEUE_DEFAULT
+    # The leases were taken when the batch was queued and may be close to expiring
+    refresh_check_leases(cert_ids, queue)
+    try:
+        certificates = (
+            session.query(*CHECK_COLUMNS)
+            .filter(Certificate.id.in_(cert_ids))
+            .all()
+        )
+        session.close()
+        missing = set(cert_ids) - {cert.id for cert in certificates}
+        if missing:
+            logger.error(f"Certificates not found for IDs: {sorted(missing)}")
+
+        CHECKS_IN_FLIGHT.inc(len(certificates))
+        try:
+            with writer:
+                deferred = asyncio.run(run_checks(certificates, writer))
+        finally:
+            CHECKS_IN_FLIGHT.dec(len(certificates))
+        if deferred:
+            defer_checks(deferred, queue)
+        logger.info(f"Checked {len(certificates) - len(deferred)} certificates")
+    except Exception as e:
+        logger.error(f"Error checking certificate batch: {str(e)}")
+        try:
+            # Results that already reached the database are kept
+            mark_errors(get_engine(), [cert_id for cert_id in cert_ids
+                                 if cert_id not in writer.written and cert_id not in deferred])
+        except Exception:
+            logger.error("Error marking certificate batch as failed")
+    finally:
+        session.close()
+        release_check_leases([cert_id for cert_id in cert_ids if cert_id not in deferred], queue)
+
+@app.task(name='app.tasks.dispatch_due_certificates')
+@SWEEP_SECONDS.labels('dispatch_due_certificates').time()
+def dispatch_due_certificates():
+    """Publish batch checks for the certificates whose next check time has passed.
+
+    At most the configured sweep rate is claimed per run and published in
+    slices spread over the interval until the next run, so a backlog is
+    worked off at a steady pace instead of in one burst.
+    """
+    try:
+        certificates = claim_due_certificates(get_engine(), limit=dispatch_limit())
+        publish_routed_checks(certificates, spread=DISPATCH_INTERVAL)
+        if certificates:
+            logger.info(f"Dispatched checks for {len(certificates)} due certificates")
+    except Exception as e:
+        logger.error(f"Error dispatching due certificate checks: {str(e)}")
+
+def publish_checks(cert_ids, queue=QUEUE_DEFAULT, spread=0, queued=0):
+    """Queue batch checks for ``cert_ids`` on ``queue`` over a single broker connection.
+
+    Certificates that already have a check queued or running are skipped.
+    With ``spread`` the batches are split into slices DISPATCH_SLICE_SECONDS
+    apart over that many seconds. ``queued`` checks published just before
+    are ahead of them in the queue, which the check leases have to cover.
+    """
+    cert_ids = acquire_check_leases(cert_ids, queue, wait=queue_wait(queued + len(cert_ids), spread))
+    if not cert_ids:
+        return
+    slices = max(spread // DISPATCH_SLICE_SECONDS, 1)
+    batch_size = min(SWEEP_CHUNK_SIZE, math.ceil(len(cert_ids) / slices))
+    batches = [cert_ids[start:start + batch_size] for start in range(0, len(cert_ids), batch_size)]
+    with app.producer_or_acquire() as producer:
+        for index, batch in enumerate(batches):
+            countdown = spread * index // len(batches)
+            check_certificates.apply_async(args=[batch], countdown=countdown or None, queue=queue,
+                                           producer=producer)
+
+def publish_routed_checks(certificates, spread=0, queued=0):
+    """Queue checks for ``(id, valid_until, error_count)`` rows on their priority queues."""
+    now = datetime.utcnow()
+    by_queue = defaultdict(list)
+    for cert in certificates:
+        by_queue[check_queue(cert.valid_until, cert.error_count, now=now)].append(cert.id)
+    for queue, cert_ids in by_queue.items():
+        publish_checks(cert_ids, queue, spread, queued)
+
+@app.task(name='app.tasks.maintain_history')
+def maintain_history():
+    """Create upcoming monthly history partitions and drop those past the retention period."""
+    try:
+        with get_engine().begin() as conn:
+            ensure_partitions(conn)
+            dropped = drop_expired_partitions(conn)
+        if dropped:
+            logger.info(f"Dropped expired history partitions: {', '.join(dropped)}")
+    except Exception as e:
+        logger.error(f"Error maintaining certificate history partitions: {str(e)}")
+
+@app.task(name='app.tasks.reconcile_summary')
+def reconcile_summary():
+    """Recount the dashboard summary from the certificates table."""
+    try:
+        with get_engine().begin() as conn:
+            rebuild_summary(conn)
+        logger.info("Rebuilt certificate summary")
+    except Exception as e:
+        logger.error(f"Error rebuilding certificate summary: {str(e)}")
+
+@app.task(name='app.tasks.process_import')
+def process_import(job_id):
+    """Import an uploaded CSV parked in Redis by the API."""
+    key = IMPORT_UPLOAD_KEY.format(job_id)
+    try:
+        logger.info(f"Processing import job {job_id}")
+        stream = io.BufferedReader(RedisUpload(redis_client, key), IMPORT_READ_SIZE)
+        run_import(get_engine(), job_id, stream, publish_checks)
+        redis_client.delete(key)
+    except Exception as e:
+        logger.error(f"Error processing import job {job_id}: {str(e)}")
+        try:
+            with get_engine().begin() as conn:
+                update_job(conn, job_id, status='failed', finished_at=datetime.utcnow(),
+                           errors=json.dumps([str(e)]))
+        except Exception:
+            logger.error(f"Error marking import job {job_id} as failed")
@@ -0,0 +1,257 @@
+import os
+import time
+import logging
+from datetime import datetime
+from collections import Counter
+from sqlalchemy import select, update, delete, values, column, cast, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from .models import Certificate, CertificateHistory, ChainCertificate, CertificateChainLink, CertificateSan
+from .history import history_row
+from .summary import summary_deltas, apply_summary_deltas
+from .store import bump_generation
+from .events import change_event, publish_events
+from .metrics import PHASE_SECONDS, WRITER_ROWS
+from .probe import ERROR_INTERNAL
+
+logger = logging.getLogger(__name__)
+
+# Result writer settings
+WRITER_BATCH_SIZE = int(os.getenv('WRITER_BATCH_SIZE', '500'))
+WRITER_FLUSH_INTERVAL = float(os.getenv('WRITER_FLUSH_INTERVAL', '5'))
+
+
+class ResultWriter:
+    """Buffer probe results and write them back with one multi-row UPDATE per flush.
+
+    The buffer is due for a flush when it holds ``batch_size`` results or
+    ``flush_interval`` seconds have passed since the last flush, and is
+    flushed when the writer is closed. Async callers check :meth:`due` and
+    run :meth:`write` of a :meth:`take` batch in an executor, since a flush
+    blocks on Postgres. Each flush issues a single
+    ``UPDATE certificates ... FROM (VALUES ...)`` statement in its own
+    transaction, plus a narrower one for certificates whose fingerprint did
+    not change, the chain and SAN rows of those that did, a history row
+    for every result that starts a new run, and the resulting changes to
+    the dashboard summary counts.
+    """
+
+    # Columns written for a changed or failed result, in addition to the primary key
+    columns = {
+        'issuer': String(255),
+        'subject': String(255),
+        'serial_number': String(255),
+        'valid_from': DateTime(),
+        'valid_until': DateTime(),
+        'status': String(50),
+        'fingerprint': String(64),
+        'error_class': String(32),
+        'error_message': String(255),
+        'error_count': Integer(),
+        'next_check_at': DateTime(),
+        'last_checked': DateTime(),
+        'updated_at': DateTime(),
+    }
+    # Columns written when the stored certificate is still the one presented
+    unchanged_columns = {
+        'error_count': Integer(),
+        'next_check_at': DateTime(),
+        'last_checked': DateTime(),
+    }
+
+    def __init__(self, engine, batch_size=WRITER_BATCH_SIZE, flush_interval=WRITER_FLUSH_INTERVAL):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = {}
+        self._unchanged = {}
+        self._chains = {}
+        self._history = {}
+        self.written = set()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, cert_id, cert_info, checked_at=None, changed=False):
+        """Queue the result of a certificate check.
+
+        ``changed`` records the result in the certificate's history.
+        """
+        checked_at = checked_at or datetime.utcnow()
+        # A later result for the same certificate supersedes an earlier one
+        self._buffer.pop(cert_id, None)
+        self._unchanged.pop(cert_id, None)
+        self._chains.pop(cert_id, None)
+        self._history.pop(cert_id, None)
+        if changed:
+            self._history[cert_id] = history_row(cert_id, cert_info, checked_at)
+        if cert_info.get('unchanged'):
+            row = {name: cert_info.get(name) for name in self.unchanged_columns}
+            row['last_checked'] = checked_at
+            self._unchanged[cert_id] = row
+        else:
+            row = {name: cert_info.get(name) for name in self.columns}
+            row['last_checked'] = checked_at
+            row['updated_at'] = checked_at
+            self._buffer[cert_id] = row
+            # A result without a chain clears the stored one, as it clears the fingerprint
+            self._chains[cert_id] = (cert_info.get('chain') or [], cert_info.get('sans') or [])
+
+    def due(self):
+        """Whether the buffer reached ``batch_size`` or ``flush_interval`` has passed since the last flush."""
+        return (len(self._buffer) + len(self._unchanged) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval)
+
+    def take(self):
+        """Empty the buffer and return its contents for :meth:`write`."""
+        self._last_flush = time.monotonic()
+        batch = (self._buffer, self._unchanged, self._chains, self._history)
+        self._buffer, self._unchanged, self._chains, self._history = {}, {}, {}, {}
+        return batch
+
+    def flush(self):
+        """Write all buffered results in one transaction."""
+        return self.write(self.take())
+
+    def write(self, batch):
+        """Write a batch returned by :meth:`take` in one transaction, safe to call from another thread."""
+        rows, unchanged, chains, history = batch
+        if not rows and not unchanged:
+            return 0
+
+        started = time.perf_counter()
+        table = Certificate.__table__
+        with self.engine.begin() as conn:
+            deltas = Counter()
+            if rows:
+                # Summary counts move from the row as stored now, not as read before probing, so a
+                # certificate deleted or edited meanwhile is not counted twice. The lock keeps it that way.
+                stored = conn.execute(
+                    select(table.c.id, table.c.status, table.c.issuer, table.c.valid_until)
+                    .where(table.c.id.in_(list(rows)))
+                    .order_by(table.c.id)
+                    .with_for_update()
+                ).all()
+                for row in stored:
+                    deltas.update(summary_deltas(row, rows[row.id]))
+                # Results of certificates deleted while they were probed are dropped
+                existing = {row.id for row in stored}
+                rows = {cert_id: row for cert_id, row in rows.items() if cert_id in existing}
+                chains = {cert_id: chain for cert_id, chain in chains.items() if cert_id in existing}
+                history = {cert_id: row for cert_id, row in history.items() if cert_id in existing}
+            if rows:
+                conn.execute(update_statement(rows, self.columns))
+            if unchanged:
+                conn.execute(update_statement(unchanged, self.unchanged_columns))
+            if chains:
+                write_chains(conn, chains)
+            if history:
+                write_history(conn, list(history.values()))
+            # Last, so the summary row locks are held as briefly as possible
+            apply_summary_deltas(conn, deltas)
+        PHASE_SECONDS.labels('db_write').observe(time.perf_counter() - started)
+        WRITER_ROWS.labels('changed').inc(len(rows))
+        WRITER_ROWS.labels('unchanged').inc(len(unchanged))
+        self.written.update(rows)
+        self.written.update(unchanged)
+        if rows:
+            bump_generation()
+        # A history row marks a status or fingerprint change, exactly what event subscribers follow
+        publish_events('changed', [change_event(cert_id, rows[cert_id]) for cert_id in history if cert_id in rows])
+
+        logger.info(f"Wrote {len(rows)} certificate results, {len(unchanged)} unchanged")
+        return len(rows) + len(unchanged)
+
+    def close(self):
+        self.flush()
+
+
+def update_statement(rows, columns):
+    """Build an ``UPDATE certificates ... FROM (VALUES ...)`` writing ``columns`` of ``{id: row}``."""
+    names = list(columns)
+    data = values(
+        column('id', Integer),
+        *[column(name, type_) for name, type_ in columns.items()],
+        name='results'
+    ).data([(cert_id, *[row[name] for name in names]) for cert_id, row in rows.items()])
+
+    table = Certificate.__table__
+    # Cast explicitly, an all-NULL VALUES column is otherwise typed as text
+    return (
+        update(table)
+        .where(table.c.id == data.c.id)
+        .values({name: cast(data.c[name], type_) for name, type_ in columns.items()})
+    )
+
+
+def write_chains(conn, chains):
+    """Replace the chain links and SANs of certificates from ``{id: (chain, sans)}``, an empty chain removes them."""
+    cert_ids = list(chains)
+    # Intermediates are shared by many endpoints and stored once
+    presented = {entry['fingerprint']: entry for chain, _ in chains.values() for entry in chain}
+    if presented:
+        # Inserted in fingerprint order so concurrent flushes lock new rows in the same order and cannot deadlock
+        conn.execute(
+            insert(ChainCertificate.__table__)
+            .values([presented[key] for key in sorted(presented)])
+            .on_conflict_do_nothing(index_elements=['fingerprint'])
+        )
+
+    links = CertificateChainLink.__table__
+    conn.execute(delete(links).where(links.c.certificate_id.in_(cert_ids)))
+    chain_links = [
+        {'certificate_id': cert_id, 'position': position, 'fingerprint': entry['fingerprint']}
+        for cert_id, (chain, _) in chains.items()
+        for position, entry in enumerate(chain)
+    ]
+    if chain_links:
+        conn.execute(insert(links), chain_links)
+
+    sans = CertificateSan.__table__
+    conn.execute(delete(sans).where(sans.c.certificate_id.in_(cert_ids)))
+    names = [{'certificate_id': cert_id, 'name': name} for cert_id, (_, cert_sans) in chains.items()
+             for name in cert_sans]
+    if names:
+        conn.execute(insert(sans), names)
+
+
+def write_history(conn, rows):
+    """Append history rows without letting a missing partition fail the results they belong to."""
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(CertificateHistory.__table__), rows)
+    except Exception as e:
+        logger.error(f"Error writing {len(rows)} certificate history rows: {str(e)}")
+
+
+def mark_errors(engine, cert_ids):
+    """Flag certificates whose check could not be completed, keeping their last known details."""
+    now = datetime.utcnow()
+    table = Certificate.__table__
+    with engine.begin() as conn:
+        previous = conn.execute(
+            select(table.c.id, table.c.status, table.c.issuer, table.c.valid_until)
+            .where(table.c.id.in_(cert_ids))
+            .order_by(table.c.id)
+            .with_for_update()
+        ).all()
+        conn.execute(
+            update(table)
+            .where(table.c.id.in_(cert_ids))
+            .values(status='error', error_class=ERROR_INTERNAL, error_message='Check could not be completed',
+                    last_checked=now, updated_at=now)
+        )
+        deltas = Counter()
+        for row in previous:
+            deltas.update(summary_deltas(row, {'status': 'error', 'issuer': row.issuer,
+                                               'valid_until': row.valid_until}))
+        apply_summary_deltas(conn, deltas)
+    bump_generation()
+    publish_events('changed', [
+        change_event(row.id, {'status': 'error', 'error_class': ERROR_INTERNAL, 'issuer': row.issuer,
+                              'valid_until': row.valid_until})
+        for row in previous if row.status != 'error'
+    ])